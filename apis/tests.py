@@ -1,3 +1,57 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from orbat.models import Section, SectionAssignment, SectionSlot
+from users.models import CustomUser
+
+
+class SectionSlotLayoutAPITests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create(username="staff", display_name="staff", is_staff=True)
+        cls.member = CustomUser.objects.create(username="member", display_name="member")
+        cls.section = Section.objects.create(name="1 Section", shorthand="1", type="Infantry", max_size=8)
+        SectionAssignment.objects.create(section=cls.section, user=cls.member)
+        cls.slot = SectionSlot.objects.create(section=cls.section, name="Lead", colour="Gold")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def put_layout(self, *slots):
+        return self.client.put(f"/api/orbat/section/{self.section.pk}/slots/", {"slots": list(slots)}, format="json")
+
+    def assertLayoutUnchanged(self):
+        self.assertEqual(
+            list(SectionSlot.objects.filter(section=self.section).values_list("name", "colour")),
+            [("Lead", "Gold")],
+        )
+
+    def test_valid_layout_is_saved(self):
+        response = self.put_layout(
+            {"id": self.slot.pk, "name": "Lead", "colour": "Red", "member": str(self.member.pk)},
+            {"name": "Rifleman", "colour": "Blue"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(SectionSlot.objects.filter(section=self.section).values_list("name", "colour")),
+            [("Lead", "Red"), ("Rifleman", "Blue")],
+        )
+
+    def test_unknown_colour_is_rejected(self):
+        response = self.put_layout({"id": self.slot.pk, "name": "Lead", "colour": "Purple"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Colour must be one of", response.json()["0"][0])
+        self.assertLayoutUnchanged()
+
+    def test_non_string_colour_is_rejected(self):
+        response = self.put_layout({"id": self.slot.pk, "name": "Lead", "colour": ["Red"]})
+        self.assertEqual(response.status_code, 400)
+        self.assertLayoutUnchanged()
+
+    def test_name_longer_than_the_column_is_rejected(self):
+        response = self.put_layout({"id": self.slot.pk, "name": "x" * 80})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["0"], ["Name must be at most 50 characters."])
+        self.assertLayoutUnchanged()
@@ -5,6 +5,9 @@ from .views import *
 urlpatterns = [
     path("orbat/section/<int:section_id>/slot/<int:slot_id>/", SectionSlotAPI.as_view()),
     path("orbat/section/<int:section_id>/slot/", SectionSlotAPI.as_view()),
+    path("orbat/section/<int:section_id>/slots/", SectionSlotLayoutAPI.as_view()),
     path("orbat/section/<int:section_id>/role_options/", SectionRoleOptions.as_view()),
     path("orbat/section/<int:section_id>/members/", SectionMembersAPI.as_view()),
+    path("orbat/roster/", ORBATRosterAPI.as_view()),
+    path("orbat/roster/diff/", ORBATRosterDiffAPI.as_view()),
 ]
\ No newline at end of file
@@ -1,2 +1,3 @@
 from .base import *
-from .page_requests import *
\ No newline at end of file
+from .page_requests import *
+from .history import *
\ No newline at end of file
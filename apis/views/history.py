@@ -0,0 +1,52 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from apis.views import BaseAPIView
+from orbat.models import Section
+from orbat.roster import get_roster_as_of, diff_rosters
+
+
+class ORBATHistoryBaseAPI(BaseAPIView):
+    def context_check(self, request, method, user, *args, **kwargs):
+        if method != "GET":
+            return False
+        # Roster history is for leadership only
+        return user.is_staff or Section.objects.filter(leader=user).exists()
+
+    def _parse_date(self, request, name, default=None):
+        value = request.query_params.get(name)
+        if not value:
+            return default
+        try:
+            return parse_date(value)
+        except ValueError:
+            return None
+
+
+class ORBATRosterAPI(ORBATHistoryBaseAPI):
+    def get(self, request):
+        date = self._parse_date(request, "date", timezone.localdate())
+        if not date:
+            return Response({"detail": "date must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(get_roster_as_of(date).to_dict(), status=status.HTTP_200_OK)
+
+
+class ORBATRosterDiffAPI(ORBATHistoryBaseAPI):
+    def get(self, request):
+        from_date = self._parse_date(request, "from")
+        to_date = self._parse_date(request, "to", timezone.localdate())
+        if not from_date or not to_date:
+            return Response(
+                {"detail": "from and to must be YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        changes = diff_rosters(get_roster_as_of(from_date), get_roster_as_of(to_date))
+        return Response({
+            "from": from_date.isoformat(),
+            "to": to_date.isoformat(),
+            "changes": changes,
+        }, status=status.HTTP_200_OK)
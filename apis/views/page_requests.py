@@ -1,22 +1,37 @@
-from django.db.models import Count
+from collections import Counter
+
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.http import quote_etag, parse_etags
 from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.response import Response
 
 from apis.views import BaseAPIView
-from orbat.models import SectionSlot, RoleSlotAssignment, SectionAssignment, Role, Section
+from orbat.cache import get_or_build, get_orbat_version, invalidate_orbat_cache
+from orbat.models import SectionSlot, RoleSlotAssignment, Role, Section, SectionAssignment
+from orbat.signals import mark_users_dirty
+from orbat.snapshot import get_orbat_snapshot
+from timeline.models import TimelineTypes
+from timeline.utils import add_entry
+
+SLOT_NAME_MAX_LENGTH = SectionSlot._meta.get_field("name").max_length
+SLOT_COLOURS = [value for value, _ in SectionSlot.COLOUR_CHOICES]
 
 
 class SectionSlotAPI(BaseAPIView):
-    def _serialize_slot(self, slot):
-        role_assignments = RoleSlotAssignment.objects.filter(
-            section_slot=slot, end_date__isnull=True
-        ).select_related("role")
+    def _serialize_slot(self, slot, roles=None):
+        if roles is None:
+            roles = [
+                a.role for a in RoleSlotAssignment.objects.filter(
+                    section_slot=slot, end_date__isnull=True
+                ).select_related("role")
+            ]
 
         inline_roles = [
-            {"id": a.role.id, "name": a.role.name}
-            for a in role_assignments
+            {"id": role.id, "name": role.name}
+            for role in roles
         ]
 
         data = {
@@ -61,8 +76,11 @@ class SectionSlotAPI(BaseAPIView):
         return True
 
     def get(self, request, section_id, slot_id):
-        slot = get_object_or_404(SectionSlot, pk=slot_id)
-        return Response(self._serialize_slot(slot), status=status.HTTP_200_OK)
+        slot_node = get_orbat_snapshot().get_slot(section_id, slot_id)
+        if not slot_node:
+            return Response({"detail": "Slot not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response(self._serialize_slot(slot_node["slot"], slot_node["current_roles"]), status=status.HTTP_200_OK)
 
     def post(self, request, section_id, slot_id=None): # Create a new slot
         print("Creating new section slot")
@@ -106,72 +124,334 @@ class SectionSlotAPI(BaseAPIView):
         slot.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class SectionRoleOptions(BaseAPIView):
-    def get(self, request, section_id):
+class SectionSlotLayoutAPI(BaseAPIView):
+    """
+    Read or replace a section's whole slot layout in one request.
+    PUT takes {"slots": [{"id", "name", "member", "colour", "inline_roles"}, ...]}
+    in display order. Slots without an id are created and existing slots
+    missing from the payload are deleted.
+    """
 
-        section = Section.objects.filter(pk=section_id).first()
-        if not section:
+    def context_check(self, request, method, user, *args, **kwargs):
+        if method == "GET":
+            return True
+
+        section = get_object_or_404(Section, pk=kwargs.get("section_id"))
+        return section.leader == user or user.is_staff
+
+    def _serialize_layout(self, slots, roles_by_slot):
+        return [
+            {
+                "id": slot.id,
+                "name": slot.name,
+                "colour": slot.colour or "",
+                "member": slot.user_id,
+                "description": "",
+                "order": slot.order,
+                "inline_roles": [{"id": r.id, "name": r.name} for r in roles_by_slot.get(slot.id, [])],
+            }
+            for slot in slots
+        ]
+
+    def get(self, request, section_id):
+        section_node = get_orbat_snapshot().get_section(section_id)
+        if not section_node:
             return Response({"detail": "Section not found"}, status=status.HTTP_404_NOT_FOUND)
 
+        slots = [node["slot"] for node in section_node["slots"]]
+        roles_by_slot = {node["slot"].id: node["current_roles"] for node in section_node["slots"]}
+        return Response(self._serialize_layout(slots, roles_by_slot))
+
+    def _clean_payload(self, payload):
+        """
+        Copy of the submitted slots with members as strings and inline roles
+        as ids, plus errors for entries that do not have the expected shape.
+        """
+        cleaned, errors = [], {}
+        for index, entry in enumerate(payload):
+            if not isinstance(entry, dict):
+                errors[index] = ["Each slot must be an object."]
+                continue
+
+            entry_errors = []
+            slot_id = entry.get("id")
+            if slot_id is not None and (not isinstance(slot_id, int) or isinstance(slot_id, bool)):
+                entry_errors.append("Slot id must be an integer.")
+
+            name = entry.get("name")
+            if name is not None and not isinstance(name, str):
+                entry_errors.append("Name must be a string.")
+            elif name and len(name) > SLOT_NAME_MAX_LENGTH:
+                entry_errors.append(f"Name must be at most {SLOT_NAME_MAX_LENGTH} characters.")
+
+            colour = entry.get("colour") or None
+            if colour is not None and (not isinstance(colour, str) or colour not in SLOT_COLOURS):
+                entry_errors.append(f"Colour must be one of {', '.join(SLOT_COLOURS)}.")
+
+            inline_roles = entry.get("inline_roles") or []
+            if not isinstance(inline_roles, list):
+                entry_errors.append("Inline roles must be a list.")
+                inline_roles = []
+            role_ids = []
+            for role in inline_roles:
+                role_id = role.get("id") if isinstance(role, dict) else role
+                if not isinstance(role_id, int) or isinstance(role_id, bool):
+                    entry_errors.append("Each inline role must be a role id or an object with an id.")
+                    continue
+                role_ids.append(role_id)
+
+            if entry_errors:
+                errors[index] = entry_errors
+                continue
+
+            cleaned.append({
+                "id": slot_id,
+                "name": name,
+                "member": str(entry["member"]) if entry.get("member") else None,
+                "colour": colour,
+                "inline_roles": role_ids,
+            })
+        return cleaned, errors
+
+    def _validate(self, section, payload, existing, member_ids, roles):
+        errors = {}
+        seen_slot_ids = set()
+        seen_members = set()
+        role_totals = Counter()
+        # Rank roles held anywhere in the section rule out their incompatible roles
+        section_rank_ids = {
+            role_id for entry in payload for role_id in entry["inline_roles"]
+            if role_id in roles and roles[role_id].is_rank
+        }
 
-        # Optional: allow ?slot_id=123 to account for inline roles in this slot
-        slot_id = request.query_params.get("slot_id")
-        inline_role_ids = set()
-        if slot_id:
-            role_assignments = RoleSlotAssignment.objects.filter(
-                section_slot__pk=slot_id, end_date__isnull=True
-            ).select_related("role")
+        for index, entry in enumerate(payload):
+            entry_errors = []
+            slot_id = entry["id"]
+            if slot_id is not None:
+                if slot_id not in existing:
+                    entry_errors.append(f"Slot {slot_id} does not belong to this section.")
+                elif slot_id in seen_slot_ids:
+                    entry_errors.append(f"Slot {slot_id} is listed more than once.")
+                seen_slot_ids.add(slot_id)
+
+            if not entry["name"]:
+                entry_errors.append("Name is required.")
+
+            member = entry["member"]
+            if member:
+                if member not in member_ids:
+                    entry_errors.append(f"Member {member} is not in this section.")
+                elif member in seen_members:
+                    entry_errors.append(f"Member {member} is slotted more than once.")
+                seen_members.add(member)
+
+            slot_role_ids = set(entry["inline_roles"])
+            for role_id in entry["inline_roles"]:
+                role = roles.get(role_id)
+                if not role:
+                    entry_errors.append(f"Role {role_id} does not exist.")
+                    continue
+                allowed_section_ids = {s.id for s in role.allowed_sections.all()}
+                if allowed_section_ids and section.id not in allowed_section_ids:
+                    entry_errors.append(f"Role {role.name} is not allowed in this section.")
+                conflicts = [
+                    r.name for r in role.incompatible_roles.all()
+                    if r.id in slot_role_ids or r.id in section_rank_ids
+                ]
+                if conflicts:
+                    entry_errors.append(f"Role {role.name} is incompatible with {', '.join(conflicts)}.")
+                role_totals[role_id] += 1
+
+            if entry_errors:
+                errors[index] = entry_errors
+
+        for role_id, total in role_totals.items():
+            role = roles[role_id]
+            if role.max_per_section is not None and total > role.max_per_section:
+                errors.setdefault("roles", []).append(
+                    f"Role {role.name} is limited to {role.max_per_section} per section."
+                )
+
+        return errors
+
+    def _log_changes(self, section, slots, previous_users, added_roles, roles, now):
+        """Timeline entries for members moved into slots and roles added to occupied slots"""
+        slots_by_id = {slot.id: slot for slot in slots}
+        for slot in slots:
+            if slot.user_id and str(slot.user_id) != previous_users.get(slot.id):
+                add_entry(TimelineTypes.ROLE_ASSIGNED, slot.user_id, section=section, description=slot.name,
+                          related_object=slot, timestamp=now)
+        for assignment in added_roles:
+            slot = slots_by_id[assignment.section_slot_id]
+            if slot.user_id:
+                add_entry(TimelineTypes.ROLE_ASSIGNED, slot.user_id, section=section,
+                          description=roles[assignment.role_id].name, related_object=assignment, timestamp=now)
+
+    def put(self, request, section_id):
+        section = get_object_or_404(Section, pk=section_id)
 
-            inline_role_ids = {r.role.id for r in role_assignments}
+        payload = request.data.get("slots") if isinstance(request.data, dict) else None
+        if not isinstance(payload, list):
+            return Response({"slots": ["A list of slots is required."]}, status=status.HTTP_400_BAD_REQUEST)
+        payload, errors = self._clean_payload(payload)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        with transaction.atomic():
+            existing = {
+                slot.id: slot
+                for slot in SectionSlot.objects.select_for_update().filter(section=section)
+            }
+            member_ids = {
+                str(user_id) for user_id in SectionAssignment.objects.filter(
+                    section=section, end_date__isnull=True
+                ).values_list("user_id", flat=True)
+            }
+            roles = {r.id: r for r in Role.objects.prefetch_related("allowed_sections", "incompatible_roles")}
+
+            errors = self._validate(section, payload, existing, member_ids, roles)
+            if errors:
+                transaction.set_rollback(True)
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+            # Everyone slotted before or after the change needs their rank recomputed
+            mark_users_dirty(slot.user_id for slot in existing.values())
+            previous_users = {slot.id: str(slot.user_id) for slot in existing.values() if slot.user_id}
+
+            kept_ids = {entry["id"] for entry in payload if entry["id"] is not None}
+            removed_ids = set(existing) - kept_ids
+            if removed_ids:
+                SectionSlot.objects.filter(pk__in=removed_ids).delete()
+
+            slots, new_slots = [], []
+            for order, entry in enumerate(payload, start=1):
+                slot = existing.get(entry["id"]) or SectionSlot(section=section)
+                slot.name = entry["name"]
+                slot.user_id = entry["member"]
+                slot.colour = entry["colour"]
+                slot.order = order
+                slots.append(slot)
+                if not slot.pk:
+                    new_slots.append(slot)
+
+            SectionSlot.objects.bulk_update(
+                [slot for slot in slots if slot.pk], ["name", "user", "colour", "order"]
+            )
+            SectionSlot.objects.bulk_create(new_slots)
+
+            # Sync inline roles: end the ones dropped, add the ones new to each slot
+            active_roles = RoleSlotAssignment.objects.filter(
+                section_slot__in=kept_ids, end_date__isnull=True
+            ).values_list("id", "section_slot_id", "role_id")
+            current = {(slot_id, role_id): pk for pk, slot_id, role_id in active_roles}
+            wanted = {
+                (slot.id, role_id)
+                for slot, entry in zip(slots, payload)
+                for role_id in entry["inline_roles"]
+            }
+            ended = [pk for key, pk in current.items() if key not in wanted]
+            if ended:
+                RoleSlotAssignment.objects.filter(pk__in=ended).update(end_date=now)
+            added_roles = RoleSlotAssignment.objects.bulk_create([
+                RoleSlotAssignment(section_slot_id=slot_id, role_id=role_id, start_date=now)
+                for slot_id, role_id in wanted - current.keys()
+            ])
 
-        roles = Role.objects.all().prefetch_related("allowed_sections", "incompatible_roles")
+            mark_users_dirty(slot.user_id for slot in slots)
+            self._log_changes(section, slots, previous_users, added_roles, roles, now)
+            invalidate_orbat_cache()
+
+        roles_by_slot = {}
+        for slot, entry in zip(slots, payload):
+            roles_by_slot[slot.id] = [roles[role_id] for role_id in entry["inline_roles"]]
+        return Response(self._serialize_layout(slots, roles_by_slot), status=status.HTTP_200_OK)
 
-        section_role_counts = (
-            RoleSlotAssignment.objects
-            .filter(section_slot__section=section, end_date__isnull=True)
-            .values("role")
-            .annotate(count=Count("id"))
-        )
 
-        role_counts = {entry["role"]: entry["count"] for entry in section_role_counts}
+class SectionRoleOptions(BaseAPIView):
+    def _build_role_options(self, section, slot_id=None):
+        # One pass over the section's active assignments gives both the
+        # per-role counts and the roles already inline on the requested slot
+        role_counts = Counter()
+        inline_role_ids = set()
+        section_assignments = RoleSlotAssignment.objects.filter(
+            section_slot__section=section, end_date__isnull=True
+        ).values_list("role_id", "section_slot_id")
+        for role_id, section_slot_id in section_assignments:
+            role_counts[role_id] += 1
+            if slot_id is not None and section_slot_id == slot_id:
+                inline_role_ids.add(role_id)
+
+        roles = Role.objects.all().prefetch_related("allowed_sections", "incompatible_roles")
 
         role_options = []
         for r in roles:
+            allowed_section_ids = {s.id for s in r.allowed_sections.all()}
             # If no allowed_sections, role is globally allowed
-            if r.allowed_sections.count() == 0 or r.allowed_sections.filter(pk=section_id).exists():
+            if allowed_section_ids and section.id not in allowed_section_ids:
+                continue
+
+            current_count = role_counts[r.id]
+
+            is_capacity = False
+            if r.max_per_section is not None and current_count >= r.max_per_section:
+                # If role not already selected inline for this slot, it's at capacity
+                if r.id not in inline_role_ids:
+                    is_capacity = True
 
-                current_count = role_counts.get(r.id, 0)
+            role_options.append({
+                "id": r.id,
+                "name": r.name,
+                "shorthand": r.shorthand,
+                "is_rank": r.is_rank,
+                "is_capacity": is_capacity,
+                "conflicts": [ir.id for ir in r.incompatible_roles.all()],
+            })
 
-                is_capacity = False
-                if r.max_per_section is not None and current_count >= r.max_per_section:
-                    # If role not already selected inline for this slot, it's at capacity
-                    if r.id not in inline_role_ids:
-                        is_capacity = True
+        return role_options
 
-                role_options.append({
-                    "id": r.id,
-                    "name": r.name,
-                    "shorthand": r.shorthand,
-                    "is_rank": r.is_rank,
-                    "is_capacity": is_capacity,
-                    "conflicts": list(r.incompatible_roles.values_list("id", flat=True)),
-                })
+    def _cache_headers(self, etag):
+        # no-cache makes the browser revalidate with If-None-Match on every open
+        return {"ETag": etag, "Cache-Control": "private, no-cache"}
 
-        return Response(role_options)
+    def get(self, request, section_id):
+        # Optional: allow ?slot_id=123 to account for inline roles in this slot
+        slot_id = request.query_params.get("slot_id")
+        try:
+            slot_id = int(slot_id) if slot_id else None
+        except ValueError:
+            return Response({"slot_id": ["A valid integer is required."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        # A deleted section must 404 even for clients holding an old ETag
+        section = Section.objects.filter(pk=section_id).first()
+        if not section:
+            return Response({"detail": "Section not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        # Options only change with the ORBAT, so the version makes a cheap validator
+        etag = quote_etag(f"role-options-{get_orbat_version()}-{section.pk}-{slot_id or ''}")
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=self._cache_headers(etag))
+
+        role_options = get_or_build(
+            f"section:{section.pk}:role_options:{slot_id or ''}",
+            lambda: self._build_role_options(section, slot_id),
+        )
+
+        return Response(role_options, headers=self._cache_headers(etag))
 
 
 class SectionMembersAPI(BaseAPIView):
     def get(self, request, section_id):
-        active_assignments = SectionAssignment.objects.filter(
-            section_id=section_id, end_date__isnull=True
-        ).select_related("user")
+        section_node = get_orbat_snapshot().get_section(section_id)
+        if not section_node:
+            return Response({"detail": "Section not found"}, status=status.HTTP_404_NOT_FOUND)
 
         members = [
             {
-                'id': a.user.id,
-                'name': a.user.get_ranked_name(),
+                'id': user.id,
+                'name': user.get_ranked_name(),
             }
-            for a in active_assignments if a.user
+            for user in section_node["current_members"]
         ]
         # print(members)
         return Response(members)
\ No newline at end of file
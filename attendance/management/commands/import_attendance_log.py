@@ -0,0 +1,165 @@
+import re
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendance.models import Attendance
+from events.managers import AttendanceBatch, JOIN, LEAVE
+from external_auth.models import SteamAccount, TeamSpeakAccount
+
+# Arma 3 RPT: "2026/05/01, 19:03:12 Player Foo connected (id=7656119...)." / "... Player Foo disconnected."
+RPT_LINE = re.compile(
+    r"^\s*(?P<timestamp>\d{4}/\d{2}/\d{2}, \d{1,2}:\d{2}:\d{2}) Player (?P<name>.+?) "
+    r"(?:connected \(id=(?P<id>\d+)\)|disconnected)\.?\s*$"
+)
+# TeamSpeak server log: "2026-05-01 19:02:11.123456|INFO |VirtualServerBase|1 |client connected 'Foo'(id:12) ..."
+TEAMSPEAK_LINE = re.compile(
+    r"^(?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})(?:\.\d+)?\|.*?\|"
+    r"client (?P<action>connected|disconnected) '(?P<name>.*?)'\(id:(?P<id>\d+)\)"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import attendance from a game server RPT or TeamSpeak server log. "
+        "The file is streamed line by line and fed to the attendance ingest in batches. "
+        "Each progress line ends with the byte offset to pass to --offset to resume. "
+        "When resuming an RPT log, connect lines before the offset are scanned again, without being "
+        "imported, so disconnects can still be matched to players by name."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Log file to import")
+        parser.add_argument("--format", choices=["auto", "rpt", "teamspeak"], default="auto")
+        parser.add_argument("--offset", type=int, default=0, help="Byte offset to start reading from")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Join/leave records per flush")
+        parser.add_argument("--tz", help="Time zone of the log timestamps (default EVENT_TIME_ZONE)")
+        parser.add_argument("--dry-run", action="store_true", help="Parse and match lines without writing")
+
+    def handle(self, *args, **options):
+        try:
+            self.tz = ZoneInfo(options["tz"] or settings.EVENT_TIME_ZONE)
+        except (KeyError, ValueError):
+            raise CommandError(f"Unknown time zone {options['tz']!r}")
+        self.dry_run = options["dry_run"]
+
+        parsers = {"rpt": self.parse_rpt, "teamspeak": self.parse_teamspeak}
+        if options["format"] != "auto":
+            parsers = {options["format"]: parsers[options["format"]]}
+        self.parsers = list(parsers.values())
+
+        # One query per provider, then every line is a dict lookup
+        self.steam_users = dict(
+            SteamAccount.objects.filter(user__isnull=False).values_list("external_id", "user_id")
+        )
+        self.teamspeak_users = dict(
+            TeamSpeakAccount.objects.filter(user__isnull=False).values_list("external_id", "user_id")
+        )
+        # RPT disconnect lines only carry the name, so remember who connected under it
+        self.rpt_names = {}
+        self.unmatched = set()
+
+        try:
+            log = open(options["path"], "rb")
+        except OSError as e:
+            raise CommandError(f"Cannot open {options['path']}: {e}")
+
+        totals = {"created": 0, "updated": 0, "deleted": 0}
+        self.started = time.monotonic()
+        self.lines = self.records = 0
+        offset = options["offset"]
+        with log:
+            if offset and self.parse_rpt in self.parsers:
+                self.rebuild_rpt_names(log, offset)
+            log.seek(offset)
+            batch = AttendanceBatch(Attendance.objects)
+            for raw in log:
+                offset += len(raw)
+                self.lines += 1
+                record = self.parse(raw.decode("utf-8", errors="replace"))
+                if record is None:
+                    continue
+                batch.add(*record)
+                self.records += 1
+                if len(batch) >= options["batch_size"]:
+                    self.flush(batch, totals, offset)
+            self.flush(batch, totals, offset)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {totals['created']} created, {totals['updated']} updated, {totals['deleted']} removed"
+            + (f", {len(self.unmatched)} unknown player ids" if self.unmatched else "")
+        ))
+
+    def flush(self, batch, totals, offset):
+        if self.dry_run:
+            batch.records = []
+        else:
+            for name, count in batch.flush().items():
+                totals[name] += count
+        elapsed = max(time.monotonic() - self.started, 0.001)
+        self.stdout.write(
+            f"{self.lines} lines, {self.records} records, {self.lines / elapsed:.0f} lines/s, offset {offset}"
+        )
+
+    # --- Parsing ---
+
+    def parse(self, line):
+        """(user id, timestamp, action) for a join/leave line of a known player, else None"""
+        for parser in self.parsers:
+            record = parser(line)
+            if record is not None:
+                return record
+        return None
+
+    def _timestamp(self, value, fmt):
+        return timezone.make_aware(datetime.strptime(value, fmt), self.tz)
+
+    def _record(self, accounts, external_id, timestamp, action):
+        user_id = accounts.get(external_id)
+        if user_id is None:
+            self.unmatched.add(external_id)
+            return None
+        return user_id, timestamp, action
+
+    def parse_rpt(self, line):
+        match = RPT_LINE.match(line)
+        if not match:
+            return None
+        external_id = match["id"]
+        if external_id:
+            self.rpt_names[match["name"]] = external_id
+            action = JOIN
+        else:
+            external_id = self.rpt_names.get(match["name"])
+            if external_id is None:
+                return None  # Connected before the log started, nothing to match on
+            action = LEAVE
+        timestamp = self._timestamp(match["timestamp"], "%Y/%m/%d, %H:%M:%S")
+        return self._record(self.steam_users, external_id, timestamp, action)
+
+    def rebuild_rpt_names(self, log, offset):
+        """Fill rpt_names from the connect lines before `offset` without importing them"""
+        log.seek(0)
+        position = 0
+        for raw in log:
+            position += len(raw)
+            if position > offset:
+                break
+            if b" connected (id=" not in raw:
+                continue
+            match = RPT_LINE.match(raw.decode("utf-8", errors="replace"))
+            if match and match["id"]:
+                self.rpt_names[match["name"]] = match["id"]
+        self.stdout.write(f"Resuming at offset {offset} with {len(self.rpt_names)} known RPT player names")
+
+    def parse_teamspeak(self, line):
+        match = TEAMSPEAK_LINE.match(line)
+        if not match:
+            return None
+        timestamp = self._timestamp(match["timestamp"], "%Y-%m-%d %H:%M:%S")
+        action = JOIN if match["action"] == "connected" else LEAVE
+        return self._record(self.teamspeak_users, match["id"], timestamp, action)
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from attendance.models import Attendance, MonthlyAttendance, CampaignAttendance
+from attendance.stats import refresh_attendance_stats, REFRESH_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the monthly and campaign attendance totals from scratch. "
+        "Only needed once for existing data, attendance changes refresh them incrementally."
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        user_ids = list(Attendance.objects.order_by().values_list("user_id", flat=True).distinct())
+        # Users without any attendance left keep no totals
+        attending = Attendance.objects.values("user_id")
+        MonthlyAttendance.objects.exclude(user_id__in=attending).delete()
+        CampaignAttendance.objects.exclude(user_id__in=attending).delete()
+
+        for i in range(0, len(user_ids), REFRESH_CHUNK_SIZE):
+            refresh_attendance_stats(user_ids[i:i + REFRESH_CHUNK_SIZE])
+            done = min(i + REFRESH_CHUNK_SIZE, len(user_ids))
+            self.stdout.write(f"{done}/{len(user_ids)} users, {time.monotonic() - started:.1f}s")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{MonthlyAttendance.objects.count()} monthly and {CampaignAttendance.objects.count()} campaign rows"
+        ))
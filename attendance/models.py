@@ -1,7 +1,9 @@
 from django.conf import settings
 from django.db import models
 
-from events.models import Event
+from attendance.sessions import minutes_present, to_epoch
+from events.managers import AttendanceManager
+from events.models import Event, Campaign
 
 
 class Attendance(models.Model):
@@ -13,10 +15,80 @@ class Attendance(models.Model):
     # Could also add a flag if they left early or disconnected
     manual = models.BooleanField(default=False)
     left_early = models.BooleanField(default=False)
+    # [[join, leave], ...] in epoch seconds, see attendance.sessions
+    sessions = models.JSONField(default=list, blank=True)
+    # Time actually connected inside the event window, kept in sync by the ingest
+    minutes_present = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+
+    objects = AttendanceManager()
 
     class Meta:
         unique_together = ("event", "user")
         ordering = ["event", "first_join"]
 
     def __str__(self):
-        return f"{self.user.display_name} - {self.event.name} ({'Manual' if self.manual else 'Auto'})"
\ No newline at end of file
+        return f"{self.user.display_name} - {self.event.name} ({'Manual' if self.manual else 'Auto'})"
+
+    def get_sessions(self):
+        """Recorded sessions, or first_join..last_seen for rows without any (manual or older entries)"""
+        if self.sessions:
+            return self.sessions
+        if self.first_join and self.last_seen:
+            return [[to_epoch(self.first_join), to_epoch(self.last_seen)]]
+        return []
+
+    def compute_minutes_present(self, window_start=None, window_end=None):
+        """Minutes connected inside the event window, None when there is nothing recorded"""
+        sessions = self.get_sessions()
+        if not sessions:
+            return None
+        if window_start is None:
+            window_start, window_end = self.event.get_window()
+        return minutes_present(sessions, window_start, window_end, open_until=self.last_seen)
+
+    @property
+    def percent_present(self):
+        start, end = self.event.get_window()
+        event_minutes = (end - start).total_seconds() // 60
+        if self.minutes_present is None or event_minutes <= 0:
+            return None
+        return round(100 * self.minutes_present / event_minutes)
+
+
+class AttendanceStat(models.Model):
+    """
+    Precomputed attendance totals for one user over a period, rebuilt by
+    attendance.stats whenever that user's attendance changes.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="%(class)s_set")
+    events_attended = models.PositiveIntegerField(default=0)
+    minutes_present = models.PositiveIntegerField(default=0)
+    left_early = models.PositiveIntegerField(default=0)
+    last_attended = models.DateField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+
+class MonthlyAttendance(AttendanceStat):
+    # First day of the month
+    month = models.DateField()
+
+    class Meta:
+        unique_together = ("user", "month")
+        ordering = ["-month"]
+        indexes = [models.Index(fields=["month", "-events_attended"])]
+
+    def __str__(self):
+        return f"{self.user.display_name} - {self.month:%Y-%m} ({self.events_attended})"
+
+
+class CampaignAttendance(AttendanceStat):
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name="attendance_stats")
+
+    class Meta:
+        unique_together = ("user", "campaign")
+        indexes = [models.Index(fields=["campaign", "-events_attended"])]
+
+    def __str__(self):
+        return f"{self.user.display_name} - {self.campaign.name} ({self.events_attended})"
@@ -0,0 +1,51 @@
+# Session intervals stored on Attendance.sessions: a list of [join, leave]
+# pairs in epoch seconds, leave being None while the player is still connected.
+
+
+def to_epoch(value):
+    return int(value.timestamp())
+
+
+def open_session(sessions, timestamp):
+    """Record a join, a join while already connected keeps the open session"""
+    if not sessions or sessions[-1][1] is not None:
+        sessions.append([to_epoch(timestamp), None])
+
+
+def close_session(sessions, timestamp):
+    """Record a leave against the open session, if any"""
+    if sessions and sessions[-1][1] is None:
+        sessions[-1][1] = max(sessions[-1][0], to_epoch(timestamp))
+
+
+def seconds_in_window(sessions, window_start, window_end, open_until):
+    """
+    Seconds covered by the union of `sessions` inside [window_start, window_end],
+    all in epoch seconds. An open session counts up to `open_until`.
+    Sessions are clipped to the window, sorted once and merged in a single sweep.
+    """
+    clipped = sorted(
+        (max(start, window_start), min(open_until if end is None else end, window_end))
+        for start, end in sessions
+    )
+    total = 0
+    current_start = current_end = None
+    for start, end in clipped:
+        if end <= start:
+            continue
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        elif end > current_end:
+            current_end = end
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+def minutes_present(sessions, window_start, window_end, open_until=None):
+    """Whole minutes of `sessions` inside the window, the arguments being aware datetimes"""
+    window_start, window_end = to_epoch(window_start), to_epoch(window_end)
+    open_until = window_end if open_until is None else to_epoch(open_until)
+    return seconds_in_window(sessions, window_start, window_end, open_until) // 60
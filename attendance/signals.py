@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from attendance.models import Attendance
+from attendance.stats import queue_stats_refresh
+from events.models import Event
+
+
+@receiver([post_save, post_delete], sender=Attendance)
+def refresh_stats_on_attendance_change(sender, instance, **kwargs):
+    queue_stats_refresh([instance.user_id])
+
+
+@receiver(post_save, sender=Event)
+def refresh_stats_on_event_change(sender, instance, created, **kwargs):
+    if created:
+        return
+    changed = {f for f in instance._tracked_fields if instance.get_loaded_value(f) != getattr(instance, f)}
+    if changed - {"campaign_id"}:
+        # New times change the minutes inside the window, a new date moves the
+        # attendance to another month. Refreshing the minutes queues the stats too.
+        Attendance.objects.refresh_minutes_present(Attendance.objects.filter(event=instance))
+    elif changed:
+        queue_stats_refresh(Attendance.objects.filter(event=instance).values_list("user_id", flat=True))
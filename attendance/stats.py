@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+
+from attendance.models import Attendance, MonthlyAttendance, CampaignAttendance
+from core.transactions import get_commit_buffer, get_commit_buffers
+from events.models import Event
+
+# Users refreshed per round trip, keeps the IN lists under SQLite's variable limit
+REFRESH_CHUNK_SIZE = 500
+
+
+def _totals(rows, *group):
+    # order_by() drops Attendance's default ordering, which would otherwise leak into the GROUP BY
+    return (
+        rows.order_by().values("user_id", *group)
+        .annotate(
+            events_attended=Count("id"),
+            minutes_present=Coalesce(Sum("minutes_present"), 0),
+            left_early_count=Count("id", filter=Q(left_early=True)),
+            last_attended=Max("event__date"),
+        )
+    )
+
+
+def _stat(model, row):
+    row["left_early"] = row.pop("left_early_count")
+    return model(**row)
+
+
+def refresh_attendance_stats(user_ids):
+    """
+    Rebuild the monthly and campaign totals of `user_ids` from their
+    attendance rows: two aggregate queries, then the old rows are swapped
+    for the new ones in one transaction.
+    """
+    user_ids = list(set(user_ids))
+    for i in range(0, len(user_ids), REFRESH_CHUNK_SIZE):
+        chunk = user_ids[i:i + REFRESH_CHUNK_SIZE]
+        rows = Attendance.objects.filter(user_id__in=chunk)
+        monthly = [
+            _stat(MonthlyAttendance, row)
+            for row in _totals(rows.annotate(month=TruncMonth("event__date")), "month")
+        ]
+        campaigns = [
+            _stat(CampaignAttendance, row)
+            for row in _totals(
+                rows.filter(event__campaign__isnull=False).annotate(campaign_id=F("event__campaign_id")),
+                "campaign_id",
+            )
+        ]
+        with transaction.atomic():
+            MonthlyAttendance.objects.filter(user_id__in=chunk).delete()
+            CampaignAttendance.objects.filter(user_id__in=chunk).delete()
+            MonthlyAttendance.objects.bulk_create(monthly)
+            CampaignAttendance.objects.bulk_create(campaigns)
+
+
+class PendingStatsRefresh:
+    """Users whose stats are refreshed when the transaction commits"""
+
+    def __init__(self):
+        self.user_ids = set()
+
+    def flush(self):
+        # The first flush on commit takes the sets queued by other savepoints too
+        user_ids = set(self.user_ids)
+        for pending in get_commit_buffers("attendance_stats"):
+            user_ids |= pending.user_ids
+            pending.user_ids = set()
+        self.user_ids = set()
+        if user_ids:
+            refresh_attendance_stats(user_ids)
+
+
+def queue_stats_refresh(user_ids):
+    """
+    Refresh the stats of `user_ids` when the current transaction commits.
+    Calls within one transaction share a single refresh, users queued in a
+    savepoint that rolls back are dropped with it, and outside a
+    transaction the refresh runs straight away.
+    """
+    pending = get_commit_buffer("attendance_stats", PendingStatsRefresh)
+    if pending is None:
+        refresh_attendance_stats(user_ids)
+        return
+    pending.user_ids.update(user_ids)
+
+
+def get_monthly_attendance(user):
+    """
+    The user's monthly totals, newest first, each with the number of
+    events held that month and the share of them attended.
+    """
+    months = list(MonthlyAttendance.objects.filter(user=user).order_by("-month"))
+    if not months:
+        return []
+    held = dict(
+        Event.objects.filter(date__gte=months[-1].month)
+        .annotate(month=TruncMonth("date")).order_by()
+        .values("month").annotate(count=Count("id")).values_list("month", "count")
+    )
+    for stat in months:
+        stat.events_held = held.get(stat.month, 0)
+        stat.percent_attended = round(100 * stat.events_attended / stat.events_held) if stat.events_held else None
+    return months
+
+
+def get_attendance_leaderboard(month, limit=10):
+    """Most events attended in `month` (its first day), read from the (month, events_attended) index"""
+    return (
+        MonthlyAttendance.objects.filter(month=month)
+        .select_related("user")
+        .order_by("-events_attended", "-minutes_present")[:limit]
+    )
+
+
+def get_inactive_users(since, users=None):
+    """Users with no attendance from the month of `since` onwards"""
+    users = users if users is not None else get_user_model().objects.all()
+    recent = MonthlyAttendance.objects.filter(user=OuterRef("pk"), month__gte=since.replace(day=1))
+    return users.filter(~Exists(recent))
@@ -1,3 +1,161 @@
+from datetime import date, datetime, time
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import transaction
 from django.test import TestCase
 
-# Create your tests here.
+from attendance.models import Attendance, CampaignAttendance, MonthlyAttendance
+from attendance.stats import PendingStatsRefresh
+from events.managers import JOIN, LEAVE
+from events.models import Campaign, Event
+from users.models import CustomUser
+
+
+def at(hour, minute=0):
+    """2026-05-01 at hour:minute in the event time zone"""
+    return datetime(2026, 5, 1, hour, minute, tzinfo=ZoneInfo(settings.EVENT_TIME_ZONE))
+
+
+class AttendanceFixtureMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username="player", display_name="player")
+        cls.event = Event.objects.create(
+            name="Operation", date=date(2026, 5, 1), start_time=time(19), end_time=time(22), type="OP"
+        )
+
+
+class AttendanceIngestTests(AttendanceFixtureMixin, TestCase):
+
+    def test_reconnects_coalesce_into_one_row(self):
+        counts = Attendance.objects.ingest([
+            (self.user, at(19), JOIN),
+            (self.user, at(19, 30), LEAVE),
+            (self.user, at(20), JOIN),
+            (self.user, at(21), LEAVE),
+        ])
+
+        self.assertEqual(counts, {"created": 1, "updated": 0, "deleted": 0})
+        row = Attendance.objects.get()
+        self.assertEqual(len(row.sessions), 2)
+        self.assertEqual((row.first_join, row.last_seen), (at(19), at(21)))
+        self.assertEqual(row.minutes_present, 90)
+        self.assertTrue(row.left_early)
+
+    def test_rows_are_reused_across_batches(self):
+        Attendance.objects.ingest([(self.user, at(19), JOIN)])
+        counts = Attendance.objects.ingest([(self.user, at(22), LEAVE)])
+
+        self.assertEqual(counts, {"created": 0, "updated": 1, "deleted": 0})
+        row = Attendance.objects.get()
+        self.assertEqual(row.minutes_present, 180)
+        self.assertFalse(row.left_early)
+
+    def test_repeated_live_joins_keep_a_single_row(self):
+        Attendance.objects.mark_user_join(self.user, at(19))
+        Attendance.objects.mark_user_join(self.user, at(19, 5))
+
+        self.assertEqual(Attendance.objects.count(), 1)
+        self.assertEqual(Attendance.objects.get().first_join, at(19))
+
+    def test_leave_before_the_start_removes_the_row(self):
+        Attendance.objects.ingest([(self.user, at(18), JOIN)])
+        counts = Attendance.objects.ingest([(self.user, at(18, 30), LEAVE)])
+
+        self.assertEqual(counts, {"created": 0, "updated": 0, "deleted": 1})
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_pre_start_join_and_leave_in_one_batch_leave_nothing_behind(self):
+        counts = Attendance.objects.ingest([(self.user, at(18), JOIN), (self.user, at(18, 30), LEAVE)])
+
+        self.assertEqual(counts, {"created": 0, "updated": 0, "deleted": 0})
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_leave_without_a_row_is_ignored(self):
+        counts = Attendance.objects.ingest([(self.user, at(20), LEAVE)])
+
+        self.assertEqual(counts, {"created": 0, "updated": 0, "deleted": 0})
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_query_count_is_constant_as_the_batch_grows(self):
+        # Events, placeholder insert, locked rows and one bulk_update, plus the savepoint pair
+        with self.assertNumQueries(6):
+            Attendance.objects.ingest([(self.user, at(19), JOIN)])
+
+        others = [CustomUser.objects.create(username=f"player{i}", display_name=f"player{i}") for i in range(20)]
+        records = [(user, at(19, i), JOIN) for i, user in enumerate(others)]
+        records += [(user, at(21, i), LEAVE) for i, user in enumerate(others)]
+        with self.assertNumQueries(6):
+            counts = Attendance.objects.ingest(records)
+        self.assertEqual(counts["created"], 20)
+
+
+class AttendanceStatsRefreshTests(AttendanceFixtureMixin, TestCase):
+    """Stats are rebuilt once per transaction, after it commits"""
+
+    def stats_refreshes(self, callbacks):
+        return [cb for cb in callbacks if isinstance(getattr(cb, "__self__", None), PendingStatsRefresh)]
+
+    def monthly(self):
+        return list(MonthlyAttendance.objects.values_list("month", "events_attended", "minutes_present"))
+
+    def ingest_evening(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.ingest([(self.user, at(19), JOIN), (self.user, at(21), LEAVE)])
+
+    def test_ingest_refreshes_the_monthly_stats_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Attendance.objects.ingest([(self.user, at(19), JOIN), (self.user, at(21), LEAVE)])
+        self.assertFalse(MonthlyAttendance.objects.exists())
+        self.assertEqual(len(self.stats_refreshes(callbacks)), 1)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.monthly(), [(date(2026, 5, 1), 1, 120)])
+
+    def test_new_event_times_recompute_the_minutes_and_stats(self):
+        self.ingest_evening()
+        event = Event.objects.get(pk=self.event.pk)
+
+        event.start_time = time(20)
+        with self.captureOnCommitCallbacks(execute=True):
+            event.save()
+
+        self.assertEqual(Attendance.objects.get().minutes_present, 60)
+        self.assertEqual(self.monthly(), [(date(2026, 5, 1), 1, 60)])
+
+    def test_new_campaign_refreshes_the_campaign_stats(self):
+        self.ingest_evening()
+        event = Event.objects.get(pk=self.event.pk)
+
+        event.campaign = Campaign.objects.create(name="Campaign")
+        with self.captureOnCommitCallbacks(execute=True):
+            event.save()
+
+        self.assertEqual(
+            list(CampaignAttendance.objects.values_list("campaign_id", "events_attended")), [(event.campaign_id, 1)]
+        )
+
+    def test_unrelated_event_changes_queue_nothing(self):
+        self.ingest_evening()
+        event = Event.objects.get(pk=self.event.pk)
+
+        event.name = "Renamed"
+        with self.captureOnCommitCallbacks() as callbacks:
+            event.save()
+
+        self.assertEqual(self.stats_refreshes(callbacks), [])
+
+    def test_rolled_back_changes_queue_nothing(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    Attendance.objects.ingest([(self.user, at(19), JOIN), (self.user, at(21), LEAVE)])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertEqual(self.stats_refreshes(callbacks), [])
+        self.assertFalse(MonthlyAttendance.objects.exists())
@@ -1,3 +1,23 @@
-from django.shortcuts import render
+from django.http import Http404
 
-# Create your views here.
+from attendance.models import CampaignAttendance
+from attendance.stats import get_monthly_attendance
+from users.views import ProfileBaseView
+
+
+class UserAttendanceView(ProfileBaseView):
+    template_name = "user_attendance.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        profile_user = context["user_profile"]
+        if profile_user is None:
+            raise Http404("User not found")
+
+        context["monthly_attendance"] = get_monthly_attendance(profile_user)
+        context["campaign_attendance"] = (
+            CampaignAttendance.objects.filter(user=profile_user)
+            .select_related("campaign")
+            .order_by("-last_attended")
+        )
+        return context
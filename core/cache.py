@@ -0,0 +1,68 @@
+import hashlib
+import time
+
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet
+
+from core.transactions import get_commit_buffer, has_commit_buffer
+
+
+def _version_key(name):
+    return f"{name}:version"
+
+
+def get_version(name, alias="default"):
+    """Current `name` version, seeded from the clock so an evicted counter never reuses old keys"""
+    cache = caches[alias]
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns())
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name, alias="default"):
+    """Move `name` to a new version, orphaning every key built from the old one"""
+    cache = caches[alias]
+    key = _version_key(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns())
+
+
+class _VersionBump:
+    def __init__(self, name, alias):
+        self.name = name
+        self.alias = alias
+
+    def flush(self):
+        bump_version(self.name, self.alias)
+
+
+def invalidate_on_commit(name, alias="default"):
+    """
+    Bump the `name` version once the current transaction commits, so other
+    requests never cache data from before the write under the new version.
+    Bumps straight away in autocommit mode.
+    """
+    if get_commit_buffer(f"cache:{name}", lambda: _VersionBump(name, alias)) is None:
+        bump_version(name, alias)
+
+
+def has_pending_invalidation(name):
+    """True while the current transaction holds `name` writes that are not yet committed"""
+    return has_commit_buffer(f"cache:{name}")
+
+
+def queryset_key(qs):
+    """
+    Short key identifying the rows `qs` selects, from a hash of its SQL.
+    None when the queryset can match nothing, e.g. filtered on an empty list.
+    """
+    try:
+        sql = str(qs.order_by().query)
+    except EmptyResultSet:
+        return None
+    return hashlib.md5(sql.encode()).hexdigest()
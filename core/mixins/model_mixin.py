@@ -1,5 +1,9 @@
+from collections import defaultdict
+
 from django.db import models
-from django.db.models import Max, F
+from django.db.models import Max, F, Case, When, Value
+
+from core.signals import ordering_changed
 
 
 class OrderedModelMixin(models.Model):
@@ -9,6 +13,25 @@ class OrderedModelMixin(models.Model):
         ordering = ["order"]
         abstract = True
 
+    @classmethod
+    def _get_scope_fields(cls):
+        scope_fields = getattr(cls, "_order_scope_fields", None)
+
+        if not scope_fields:
+            unique_fields = getattr(cls._meta, "unique_together", None)
+            if unique_fields:
+                for field_tuple in unique_fields:
+                    if "order" in field_tuple:
+                        scope_fields = [f for f in field_tuple if f != "order"]
+                        break
+
+        return scope_fields
+
+    def _get_scope_filter(self):
+        """Scope fields mapped to this object's values, by attname so foreign keys are not fetched"""
+        attnames = (self._meta.get_field(f).attname for f in self._get_scope_fields() or [])
+        return {attname: getattr(self, attname) for attname in attnames}
+
     def _get_ordering_scope(self):
         """
         Determine the queryset scope for ordering.
@@ -19,19 +42,10 @@ class OrderedModelMixin(models.Model):
         """
 
         qs = type(self).objects.all()
-        scope_fields = getattr(self, "_order_scope_fields", None)
-
-        if not scope_fields:
-            unique_fields = getattr(self._meta, "unique_together", None)
-            if unique_fields:
-                for field_tuple in unique_fields:
-                    if "order" in field_tuple:
-                        scope_fields = [f for f in field_tuple if f != "order"]
-                        break
+        scope_fields = self._get_scope_fields()
 
         if scope_fields:
-            filter_kwargs = {f: getattr(self, f) for f in scope_fields}
-            qs = qs.filter(**filter_kwargs)
+            qs = qs.filter(**self._get_scope_filter())
 
         return qs, scope_fields
 
@@ -43,36 +57,73 @@ class OrderedModelMixin(models.Model):
             self.order = max_order + 1
         super().save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        qs, _ = self._get_ordering_scope()
+        result = super().delete(*args, **kwargs)
+        # Close the gap left behind in this scope
+        if qs.filter(order__gt=self.order).update(order=F("order") - 1):
+            self._ordering_changed()
+        return result
+
+    def _ordering_changed(self):
+        ordering_changed.send(sender=type(self), scope=self._get_scope_filter())
+
+    @classmethod
+    def _apply_ordering(cls, qs, ordered_ids):
+        """Write order = position for every id with a single UPDATE ... CASE"""
+        if not ordered_ids:
+            return 0
+        whens = [When(pk=pk, then=Value(idx)) for idx, pk in enumerate(ordered_ids, start=1)]
+        return qs.filter(pk__in=ordered_ids).update(
+            order=Case(*whens, output_field=models.PositiveIntegerField())
+        )
+
+    @classmethod
+    def reorder(cls, scope, ordered_ids):
+        """
+        Renumber a scope to match `ordered_ids` (e.g. after a drag and drop).
+        `scope` maps the scope fields to values, e.g. {"section": section}.
+        Objects in the scope but missing from `ordered_ids` keep their relative
+        order after the listed ones. Two queries regardless of table size.
+        """
+        scope = scope or {}
+        qs = cls.objects.filter(**scope)
+        current_ids = list(qs.order_by("order", "id").values_list("id", flat=True))
+
+        current = set(current_ids)
+        unknown = [pk for pk in ordered_ids if pk not in current]
+        if unknown:
+            raise ValueError(f"{cls.__name__} ids {unknown} are not in scope {scope}")
+
+        listed = list(dict.fromkeys(ordered_ids))
+        seen = set(listed)
+        final_ids = listed + [pk for pk in current_ids if pk not in seen]
+
+        cls._apply_ordering(qs, final_ids)
+        ordering_changed.send(sender=cls, scope=scope)
+
     @classmethod
     def fix_ordering(cls):
         """
         Renumber all objects sequentially based on _order_scope_fields,
         then unique_together containing 'order', then globally.
+        Only needed to repair existing gaps, moves keep scopes gap-free.
         """
-        qs = cls.objects.all().order_by("order", "id")
-        instance = cls()
-        _, scope_fields = instance._get_ordering_scope()
-
-        if scope_fields:
-            # Build a set of all unique combinations for this scope
-            seen_scopes = set()
-            for obj in qs:
-                key = tuple(getattr(obj, f) for f in scope_fields)
-                seen_scopes.add(key)
-
-            for key in seen_scopes:
-                filter_kwargs = dict(zip(scope_fields, key))
-                sub_qs = qs.filter(**filter_kwargs).order_by("order", "id")
-                for idx, obj in enumerate(sub_qs, start=1):
-                    if obj.order != idx:
-                        obj.order = idx
-                        obj.save(update_fields=["order"])
-        else:
-            # No scope, global renumber
-            for idx, obj in enumerate(qs, start=1):
-                if obj.order != idx:
-                    obj.order = idx
-                    obj.save(update_fields=["order"])
+        scope_fields = cls._get_scope_fields() or []
+        attnames = [cls._meta.get_field(f).attname for f in scope_fields]
+
+        rows = cls.objects.order_by("order", "id").values_list("id", "order", *attnames)
+        next_order = defaultdict(lambda: 1)
+        changed = []
+        for pk, order, *key in rows:
+            key = tuple(key)
+            if order != next_order[key]:
+                changed.append(cls(pk=pk, order=next_order[key]))
+            next_order[key] += 1
+
+        if changed:
+            cls.objects.bulk_update(changed, ["order"])
+            ordering_changed.send(sender=cls, scope=None)
 
     # --- Core move logic ---
     def _move(self, up=True):
@@ -82,42 +133,41 @@ class OrderedModelMixin(models.Model):
         if up:
             if current_order == 1:
                 return  # Already at top
-            neighbor = qs.filter(order__lt=current_order).order_by("-order").first()
+            neighbor = qs.filter(order__lt=current_order).order_by("-order").values_list("pk", "order").first()
         else:
-            max_order = qs.aggregate(max_order=Max("order"))["max_order"] or current_order
-            if current_order >= max_order:
-                return  # Already at bottom
-            neighbor = qs.filter(order__gt=current_order).order_by("order").first()
+            neighbor = qs.filter(order__gt=current_order).order_by("order").values_list("pk", "order").first()
 
         if neighbor:
-            # Swap orders directly
-            neighbor_order = neighbor.order
-            neighbor.order = current_order
-            neighbor.save(update_fields=["order"])
-
+            # Swap both orders in one UPDATE
+            neighbor_pk, neighbor_order = neighbor
+            qs.filter(pk__in=[self.pk, neighbor_pk]).update(order=Case(
+                When(pk=self.pk, then=Value(neighbor_order)),
+                When(pk=neighbor_pk, then=Value(current_order)),
+                output_field=models.PositiveIntegerField(),
+            ))
             self.order = neighbor_order
-            self.save(update_fields=["order"])
+            self._ordering_changed()
 
     # --- Public move methods ---
     def move_up(self):
         self._move(up=True)
-        type(self).fix_ordering()
 
     def move_down(self):
         self._move(up=False)
-        type(self).fix_ordering()
 
     def move_to(self, target_position):
         """
         Shifts other objects in the scope accordingly.
         Move the current object to a specific position.
-        Runs fix ordering in case of remaining gaps.
+        Positions past the end of the scope are clamped to the last slot.
         """
+        qs, _ = self._get_ordering_scope()
+        max_order = qs.aggregate(max_order=Max("order"))["max_order"] or 1
+        target_position = max(1, min(target_position, max_order))
+
         if self.order == target_position:
             return  # Already in position
 
-        qs, _ = self._get_ordering_scope()
-
         if target_position < self.order:
             # Moving up: increment orders for items in [target_position, current_order-1]
             qs.filter(order__gte=target_position, order__lt=self.order).update(order=F('order') + 1)
@@ -126,8 +176,43 @@ class OrderedModelMixin(models.Model):
             qs.filter(order__gt=self.order, order__lte=target_position).update(order=F('order') - 1)
 
         # Assign new order to self
+        qs.filter(pk=self.pk).update(order=target_position)
         self.order = target_position
-        self.save(update_fields=["order"])
+        self._ordering_changed()
 
-        # Renumber sequentially to remove gaps
-        type(self).fix_ordering()
\ No newline at end of file
+
+class LoadedValuesMixin(models.Model):
+    """
+    Remembers the database values of `_tracked_fields` (attnames) when an
+    instance is loaded or saved, so signal handlers can see what changed
+    without re-fetching the row.
+    """
+    _tracked_fields = []
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        return instance
+
+    def _remember_loaded_values(self):
+        self._loaded_values = {f: self.__dict__[f] for f in self._tracked_fields if f in self.__dict__}
+
+    def get_loaded_value(self, attname):
+        """
+        Value of `attname` as last loaded/saved.
+        Falls back to a query for instances built with a pk but never loaded.
+        """
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is not None and attname in loaded:
+            return loaded[attname]
+        if self._state.adding or not self.pk:
+            return None
+        return type(self)._base_manager.filter(pk=self.pk).values_list(attname, flat=True).first()
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._remember_loaded_values()
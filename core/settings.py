@@ -122,6 +122,32 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Use a shared backend (e.g. filecache:///var/tmp/unithub or dbcache://unithub_cache)
+# when running more than one process, so ORBAT invalidation reaches every worker.
+
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://")
+}
+
+ORBAT_CACHE_ALIAS = env("ORBAT_CACHE_ALIAS", default="default")
+ORBAT_CACHE_TIMEOUT = env.int("ORBAT_CACHE_TIMEOUT", default=3600)
+# Historical rosters kept in memory per process
+ORBAT_ROSTER_CACHE_SIZE = env.int("ORBAT_ROSTER_CACHE_SIZE", default=32)
+
+TIMELINE_PAGE_SIZE = env.int("TIMELINE_PAGE_SIZE", default=50)
+TIMELINE_FACETS_TIMEOUT = env.int("TIMELINE_FACETS_TIMEOUT", default=300)
+
+TRAINING_REPORT_TIMEOUT = env.int("TRAINING_REPORT_TIMEOUT", default=3600)
+TRAINING_EXPIRY_WARNING_DAYS = env.int("TRAINING_EXPIRY_WARNING_DAYS", default=30)
+
+# Zone the event dates and times are entered in
+EVENT_TIME_ZONE = env("EVENT_TIME_ZONE", default="Australia/Melbourne")
+# How long before start / after end a server join or leave still counts towards an event
+EVENT_ATTENDANCE_MARGIN_MINUTES = env.int("EVENT_ATTENDANCE_MARGIN_MINUTES", default=120)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent by OrderedModelMixin after orders are rewritten with queryset updates,
+# which skip post_save. `scope` maps the scope fields to values, or is None
+# when every scope of the model was renumbered.
+ordering_changed = Signal()
@@ -0,0 +1,52 @@
+import threading
+import weakref
+
+from django.db import connection, transaction
+
+_state = threading.local()
+
+
+def _savepoint_key():
+    # atomic(savepoint=False) blocks record None and roll back with their parent
+    return tuple(sid for sid in connection.savepoint_ids if sid is not None)
+
+
+def get_commit_buffer(name, factory):
+    """
+    Object collecting work for the current transaction, built by `factory()`
+    and flushed through its `flush()` method once the transaction commits.
+    Returns None outside a transaction, where there is nothing to wait for.
+
+    Each savepoint gets its own buffer, registered with on_commit from inside
+    it, so rolling the savepoint or the whole transaction back discards the
+    buffer together with its callback. A buffer is live while Django still
+    holds that callback, which the weak reference below tells us.
+    """
+    if not connection.in_atomic_block:
+        return None
+
+    buffers = _state.__dict__.setdefault(name, {})
+    key = _savepoint_key()
+    entry = buffers.get(key)
+    if entry is not None and entry[1]() is not None:
+        return entry[0]
+
+    for stale_key in [k for k, (_, callback) in buffers.items() if callback() is None]:
+        del buffers[stale_key]
+
+    buffer = factory()
+    # The bound method is only referenced by the on_commit queue
+    callback = buffer.flush
+    transaction.on_commit(callback)
+    buffers[key] = (buffer, weakref.ref(callback))
+    return buffer
+
+
+def get_commit_buffers(name):
+    """Every `name` buffer whose on_commit callback has not run or been discarded"""
+    return [buffer for buffer, callback in getattr(_state, name, {}).values() if callback() is not None]
+
+
+def has_commit_buffer(name):
+    """True while the current transaction holds an unflushed `name` buffer"""
+    return connection.in_atomic_block and bool(get_commit_buffers(name))
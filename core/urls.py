@@ -25,6 +25,7 @@ urlpatterns = [
     path("training/", include("training.urls")),
     path("events/", include("events.urls")),
     path("api/", include("apis.urls")),
+    path("timeline/", include("timeline.urls")),
     path("auth/", include("external_auth.urls")),
     path("", include("users.urls")),
     path("", include("dashboard.urls")),
@@ -9,9 +9,4 @@ class NavShortcut(OrderedModelMixin, models.Model):
 
 
     def __str__(self):
-        return self.name
-
-    def delete(self, *args, **kwargs):
-        super().delete(*args, **kwargs)
-        # Fix ordering after delete
-        self.fix_ordering()
\ No newline at end of file
+        return self.name
\ No newline at end of file
@@ -1,3 +1,12 @@
 from django.test import TestCase
 
-# Create your tests here.
+from dashboard.models import NavShortcut
+
+
+class NavShortcutOrderingTests(TestCase):
+
+    def test_delete_closes_the_gap(self):
+        shortcuts = [NavShortcut.objects.create(name=name, url=f"/{name}/") for name in "abc"]
+        shortcuts[0].delete()
+
+        self.assertEqual(list(NavShortcut.objects.values_list("name", "order")), [("b", 1), ("c", 2)])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill in starts_at/ends_at for events saved before they were stored. "
+        "Calendar, upcoming and attendance lookups query these columns, so run it once after upgrading, "
+        "and again with --all whenever EVENT_TIME_ZONE changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Recompute every event, not only missing windows")
+
+    def handle(self, *args, **options):
+        events = Event.objects.all()
+        if not options["all"]:
+            events = events.filter(Q(starts_at__isnull=True) | Q(ends_at__isnull=True))
+        updated = Event.objects.refresh_windows(events)
+        self.stdout.write(self.style.SUCCESS(f"Updated the window of {updated} event(s)"))
@@ -1,56 +1,262 @@
 import datetime
+from collections import defaultdict
+from itertools import islice
 
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 from django.utils import timezone
 
-from attendance.models import Attendance
-from events.models import Event
+from attendance.sessions import open_session, close_session
+
+JOIN = "join"
+LEAVE = "leave"
+
+
+def get_attendance_margin():
+    return datetime.timedelta(minutes=getattr(settings, "EVENT_ATTENDANCE_MARGIN_MINUTES", 120))
+
+
+def _utc_date(value):
+    return value.astimezone(datetime.timezone.utc).date()
+
+
+class EventManager(models.Manager):
+    def active_at(self, instant, margin=None):
+        """Events running at `instant`, or within `margin` of their start/end, one range scan on starts_at"""
+        margin = margin or datetime.timedelta(0)
+        return self.filter(starts_at__lte=instant + margin, ends_at__gt=instant - margin)
+
+    def overlapping(self, start, end):
+        """Events with any part in [start, end), e.g. a calendar month"""
+        return self.filter(starts_at__lt=end, ends_at__gt=start)
+
+    def refresh_windows(self, queryset=None):
+        """Recompute starts_at/ends_at for every event (or `queryset`), e.g. after EVENT_TIME_ZONE changed"""
+        events = list(queryset if queryset is not None else self.all())
+        for event in events:
+            event.starts_at, event.ends_at = event.compute_window()
+        return self.bulk_update(events, ["starts_at", "ends_at"], batch_size=1000)
+
+
+class AttendanceBatch:
+    """
+    Coalesces join/leave records in memory per (event, user) and applies
+    them in one transaction. Records are replayed in timestamp order with
+    the same rules as mark_user_join / mark_user_leave, so a batch ends in
+    the state those calls would have left, in a fixed number of queries:
+    events, placeholder insert, locked existing rows, then one delete,
+    bulk_create and bulk_update.
+    A record counts towards every event whose window, widened by
+    EVENT_ATTENDANCE_MARGIN_MINUTES, contains it.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.records = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, user, timestamp, action):
+        """Queue a record. `user` may be an instance or pk, `action` is JOIN or LEAVE."""
+        if action not in (JOIN, LEAVE):
+            raise ValueError(f"Unknown attendance action {action!r}")
+        self.records.append((getattr(user, "pk", user), timestamp, action))
+
+    @staticmethod
+    def _load_events(records):
+        """
+        Events whose attendance margin covers any record, bucketed by every UTC
+        date the margin touches so each record only checks the events of its day.
+        """
+        from events.models import Event
+
+        margin = get_attendance_margin()
+        timestamps = [timestamp for _, timestamp, _ in records]
+        buckets = defaultdict(list)
+        events = Event.objects.filter(starts_at__lte=max(timestamps) + margin, ends_at__gt=min(timestamps) - margin)
+        for event in events:
+            event.starts, event.ends = event.get_window()
+            event.opens, event.closes = event.starts - margin, event.ends + margin
+            day, last_day = _utc_date(event.opens), _utc_date(event.closes)
+            while day <= last_day:
+                buckets[day].append(event)
+                day += datetime.timedelta(days=1)
+        return buckets
+
+    @staticmethod
+    def _events_at(buckets, timestamp):
+        return [event for event in buckets.get(_utc_date(timestamp), []) if event.opens <= timestamp < event.closes]
+
+    @staticmethod
+    def _is_placeholder(row):
+        # Inserted empty by _lock_rows; real rows always carry a join time or are manual
+        return row.first_join is None and row.last_seen is None and not row.sessions and not row.manual
+
+    def _lock_rows(self, records, buckets, events_by_id):
+        """
+        Existing rows of every (event, user) the records touch, locked until
+        the transaction ends. Pairs with a join get an empty placeholder row
+        first, so concurrent batches queue on the same row instead of both
+        inserting it. Returns ({key: row}, {key: placeholder row}).
+        """
+        join_keys = {
+            (event.id, user_id)
+            for user_id, timestamp, action in records if action == JOIN
+            for event in self._events_at(buckets, timestamp)
+        }
+        self.manager.bulk_create(
+            [self.manager.model(event_id=event_id, user_id=user_id) for event_id, user_id in join_keys],
+            ignore_conflicts=True,
+        )
+        existing, placeholders = {}, {}
+        for row in self.manager.select_for_update().filter(
+            event_id__in=events_by_id,
+            user_id__in={user_id for user_id, _, _ in records},
+        ):
+            key = (row.event_id, row.user_id)
+            if self._is_placeholder(row):
+                placeholders[key] = row
+            else:
+                existing[key] = row
+        return existing, placeholders
+
+    def flush(self):
+        """Apply every queued record, returns {"created", "updated", "deleted"} counts"""
+        from attendance.stats import queue_stats_refresh
+        records = sorted(self.records, key=lambda record: record[1])
+        self.records = []
+        counts = {"created": 0, "updated": 0, "deleted": 0}
+        if not records:
+            return counts
+
+        buckets = self._load_events(records)
+        if not buckets:
+            return counts
+        events_by_id = {event.id: event for events in buckets.values() for event in events}
+
+        with transaction.atomic():
+            existing, placeholders = self._lock_rows(records, buckets, events_by_id)
+            # (event id, user id) -> coalesced row, or None once a leave removed it
+            state = dict(existing)
+            touched = set()
+
+            for user_id, timestamp, action in records:
+                for event in self._events_at(buckets, timestamp):
+                    key = (event.id, user_id)
+                    row = state.get(key)
+                    if row is None and action == LEAVE:
+                        # Nothing recorded for this player, e.g. joined before the log started
+                        continue
+                    if row is not None and not row.sessions:
+                        # Row from before sessions were recorded, keep what it already covers
+                        row.sessions = row.get_sessions()
+                    touched.add(key)
+                    if action == JOIN:
+                        if row is None:
+                            row = self.manager.model(event=event, user_id=user_id, first_join=timestamp, last_seen=timestamp)
+                            state[key] = row
+                            open_session(row.sessions, timestamp)
+                        else:
+                            open_session(row.sessions, timestamp)
+                            # Already present, maybe reconnecting mid-event
+                            if row.first_join is None or timestamp < row.first_join:
+                                row.first_join = timestamp
+                            if row.last_seen is None or timestamp > row.last_seen:
+                                row.last_seen = timestamp
+                    elif row is not None:
+                        if timestamp < event.starts:
+                            # Left before event started
+                            state[key] = None
+                        else:
+                            close_session(row.sessions, timestamp)
+                            row.last_seen = timestamp
+                            if timestamp < event.ends:
+                                row.left_early = True
+
+            to_delete, discarded, to_create, to_update = [], [], [], []
+            for key in touched | placeholders.keys():
+                row, stored, placeholder = state.get(key), existing.get(key), placeholders.get(key)
+                if stored is not None and row is not stored:
+                    # Removed by a leave, and possibly re-created by a later join
+                    to_delete.append(stored.pk)
+                if row is None:
+                    if placeholder is not None:
+                        discarded.append(placeholder.pk)
+                    continue
+                event = events_by_id[key[0]]
+                row.minutes_present = row.compute_minutes_present(event.starts, event.ends)
+                if row.pk is not None:
+                    to_update.append(row)
+                    counts["updated"] += 1
+                elif placeholder is not None:
+                    # Fill in the placeholder rather than inserting a second row
+                    row.pk, row._state.adding = placeholder.pk, False
+                    to_update.append(row)
+                    counts["created"] += 1
+                else:
+                    to_create.append(row)
+                    counts["created"] += 1
+
+            if to_delete or discarded:
+                # Placeholders that were never filled are not reported as removed
+                self.manager.filter(pk__in=to_delete + discarded).delete()
+                counts["deleted"] = len(to_delete)
+            if to_create:
+                self.manager.bulk_create(to_create)
+            if to_update:
+                self.manager.bulk_update(
+                    to_update, ["first_join", "last_seen", "left_early", "sessions", "minutes_present"],
+                    batch_size=1000,
+                )
+            # bulk writes skip the receivers that keep the attendance stats current
+            queue_stats_refresh({user_id for _, user_id in touched})
+        return counts
 
 
 class AttendanceManager(models.Manager):
+    def ingest(self, records, batch_size=5000):
+        """
+        Apply a stream of (user, timestamp, action) records, where action is
+        JOIN or LEAVE, flushing every `batch_size` records.
+        Returns the summed {"created", "updated", "deleted"} counts.
+        """
+        totals = {"created": 0, "updated": 0, "deleted": 0}
+        records = iter(records)
+        while chunk := list(islice(records, batch_size)):
+            batch = AttendanceBatch(self)
+            for record in chunk:
+                batch.add(*record)
+            for name, count in batch.flush().items():
+                totals[name] += count
+        return totals
+
+    def refresh_minutes_present(self, queryset=None):
+        """Recompute minutes_present from the stored sessions, e.g. after an event's times changed"""
+        from attendance.stats import queue_stats_refresh
+        rows = list((queryset if queryset is not None else self.all()).select_related("event"))
+        windows = {}
+        for row in rows:
+            if row.event_id not in windows:
+                windows[row.event_id] = row.event.get_window()
+            row.minutes_present = row.compute_minutes_present(*windows[row.event_id])
+        with transaction.atomic():
+            updated = self.bulk_update(rows, ["minutes_present"], batch_size=1000)
+            queue_stats_refresh({row.user_id for row in rows})
+        return updated
+
     def mark_user_join(self, user, timestamp=None):
-        if timestamp is None:
-            timestamp = timezone.now()
-        today_events = Event.objects.filter(date=timestamp.date())
-        for event in today_events:
-            attendance, created = Attendance.objects.get_or_create(
-                event=event,
-                user=user,
-                defaults={"first_join": timestamp, "last_seen": timestamp}
-            )
-            if not created:
-                # Already present, maybe reconnecting mid-event
-                if timestamp < attendance.first_join:
-                    attendance.first_join = timestamp
-                if timestamp > attendance.last_seen:
-                    attendance.last_seen = timestamp
-                attendance.save()
+        return self.ingest([(user, timestamp or timezone.now(), JOIN)])
 
     def mark_user_leave(self, user, timestamp=None):
-        if timestamp is None:
-            timestamp = timezone.now()
-        today_events = Event.objects.filter(date=timestamp.date())
-        for event in today_events:
-            try:
-                attendance = Attendance.objects.get(event=event, user=user)
-            except Attendance.DoesNotExist:
-                continue
-
-            if timestamp < datetime.datetime.combine(event.date, event.start_time, tzinfo=timezone.utc):
-                # Left before event started
-                attendance.delete()
-            else:
-                attendance.last_seen = timestamp
-                if timestamp < datetime.datetime.combine(event.date, event.end_time, tzinfo=timezone.utc):
-                    attendance.left_early = True
-                attendance.save()
+        return self.ingest([(user, timestamp or timezone.now(), LEAVE)])
 
     def mark_manual_attendance(self, user, event, first_join=None, last_seen=None):
         """
         Create or update an attendance entry manually.
         If times are not provided, they are left blank (optional).
         """
-        attendance, created = Attendance.objects.get_or_create(
+        attendance, created = self.get_or_create(
             event=event,
             user=user,
             defaults={
@@ -74,14 +280,16 @@ class AttendanceManager(models.Manager):
         """
         Delete attendance entries for events that haven't started yet.
         """
+        from events.models import Event
+
         if server_start_time is None:
             server_start_time = timezone.now()
 
-        # Get all events today that haven't started yet
+        # Upcoming events close enough to have picked up early joins
         events_to_cleanup = Event.objects.filter(
-            date=server_start_time.date(),
-            start_time__gt=server_start_time.time()
+            starts_at__gt=server_start_time,
+            starts_at__lte=server_start_time + get_attendance_margin(),
         )
 
         # Delete any attendance entries for those events
-        self.filter(event__in=events_to_cleanup).delete()
\ No newline at end of file
+        self.filter(event__in=events_to_cleanup).delete()
@@ -1,8 +1,13 @@
 
+import datetime
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
 from django.db import models
 
 from orbat.models import Section
-from core.mixins.model_mixin import OrderedModelMixin
+from core.mixins.model_mixin import LoadedValuesMixin, OrderedModelMixin
+from events.managers import EventManager
 
 class Campaign(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -13,7 +18,7 @@ class Campaign(models.Model):
     def __str__(self):
         return self.name
 
-class Event(models.Model):
+class Event(LoadedValuesMixin, models.Model):
     EVENT_TYPE_CHOICES = [
         ('OP', 'Operation'),
         ('SI', 'Side OP'),
@@ -28,14 +33,52 @@ class Event(models.Model):
     campaign = models.ForeignKey(Campaign, on_delete=models.SET_NULL, null=True, blank=True, related_name='events')
     start_time = models.TimeField()
     end_time = models.TimeField()
+    # Last day of a multi-day event, empty when it ends on `date` (or the next morning)
+    end_date = models.DateField(null=True, blank=True)
     type = models.CharField(max_length=2, choices=EVENT_TYPE_CHOICES)
 
+    # date/start_time/end_time resolved in EVENT_TIME_ZONE, kept in sync on save
+    starts_at = models.DateTimeField(null=True, blank=True, editable=False)
+    ends_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = EventManager()
+
+    # Fields that decide which attendance counts and where it is totalled
+    _tracked_fields = ["date", "start_time", "end_time", "end_date", "campaign_id"]
+
     class Meta:
         ordering = ["-date", "start_time"]
+        indexes = [models.Index(fields=["starts_at", "ends_at"])]
 
     def __str__(self):
         return f"{self.name}"
 
+    def compute_window(self):
+        """
+        Start and end as aware datetimes. Times are local to EVENT_TIME_ZONE, and
+        an end_time at or before start_time on a single-day event means it runs past midnight.
+        """
+        tz = ZoneInfo(getattr(settings, "EVENT_TIME_ZONE", "Australia/Melbourne"))
+        end_date = self.end_date or self.date
+        if end_date == self.date and self.end_time <= self.start_time:
+            end_date += datetime.timedelta(days=1)
+        return (
+            datetime.datetime.combine(self.date, self.start_time, tzinfo=tz),
+            datetime.datetime.combine(end_date, self.end_time, tzinfo=tz),
+        )
+
+    def get_window(self):
+        """Start and end of the event as aware datetimes"""
+        if self.starts_at and self.ends_at:
+            return self.starts_at, self.ends_at
+        return self.compute_window()
+
+    def save(self, *args, **kwargs):
+        self.starts_at, self.ends_at = self.compute_window()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "starts_at", "ends_at"}
+        super().save(*args, **kwargs)
+
     @property
     def organizers(self):
         return self.roles.filter(role='Organizer')
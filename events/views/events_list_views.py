@@ -1,6 +1,8 @@
 from datetime import datetime
+from zoneinfo import ZoneInfo
 
 from dateutil.relativedelta import relativedelta
+from django.conf import settings
 from django.utils import timezone
 
 from events.models import Event, Campaign
@@ -18,7 +20,7 @@ class EventListView(EventBaseView):
         ]
 
         context["upcoming_events"] = (
-            Event.objects.filter(date__gte=timezone.now()).order_by("date")[:10]
+            Event.objects.filter(ends_at__gt=timezone.now()).order_by("starts_at")[:10]
         )
 
         return context
@@ -42,9 +44,11 @@ class EventCalendarView(EventBaseView):
         start = datetime(year, month, 1)
         end = start + relativedelta(months=1)
 
+        # Month boundaries in the events' zone, so ops running over midnight into the month show up too
+        tz = ZoneInfo(settings.EVENT_TIME_ZONE)
         events = (
-            Event.objects.filter(date__gte=start, date__lt=end)
-            .order_by("date")
+            Event.objects.overlapping(start.replace(tzinfo=tz), end.replace(tzinfo=tz))
+            .order_by("starts_at")
         )
 
         context.update({
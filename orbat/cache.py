@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from core.cache import get_version, bump_version, invalidate_on_commit, has_pending_invalidation
+
+
+def _get_alias():
+    return getattr(settings, "ORBAT_CACHE_ALIAS", "default")
+
+
+def get_orbat_version():
+    return get_version("orbat", _get_alias())
+
+
+def bump_orbat_version():
+    bump_version("orbat", _get_alias())
+
+
+def invalidate_orbat_cache():
+    """Mark the cached ORBAT as stale once the current transaction commits"""
+    invalidate_on_commit("orbat", _get_alias())
+
+
+def has_uncommitted_changes():
+    """True while the current transaction holds ORBAT writes that are not yet committed"""
+    return has_pending_invalidation("orbat")
+
+
+def get_or_build(name, builder, timeout=None):
+    """
+    Return the cached value for `name` at the current ORBAT version, building
+    and storing it on a miss. `timeout` defaults to ORBAT_CACHE_TIMEOUT.
+    """
+    if has_uncommitted_changes():
+        # Uncommitted ORBAT writes in this transaction, read straight from the database
+        return builder()
+
+    cache = caches[_get_alias()]
+    key = f"orbat:{get_orbat_version()}:{name}"
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        if timeout is None:
+            timeout = getattr(settings, "ORBAT_CACHE_TIMEOUT", 3600)
+        cache.set(key, value, timeout)
+    return value
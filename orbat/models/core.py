@@ -3,7 +3,7 @@ from django.db import models, transaction
 from django.utils import timezone
 
 from external_auth.models import DiscordAccount
-from core.mixins.model_mixin import OrderedModelMixin
+from core.mixins.model_mixin import OrderedModelMixin, LoadedValuesMixin
 
 
 class Platoon(OrderedModelMixin, models.Model):
@@ -48,12 +48,14 @@ class Role(models.Model):
     def __str__(self):
         return self.name
 
-class SectionAssignment(models.Model):
+class SectionAssignment(LoadedValuesMixin, models.Model):
     section = models.ForeignKey(Section, on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     start_date = models.DateTimeField(default=timezone.now)
     end_date = models.DateTimeField(null=True, blank=True)
 
+    _tracked_fields = ["user_id", "end_date"]
+
     def __str__(self):
         if self.end_date:
             return f"{self.user} - {self.section.name} - Expired"
@@ -62,7 +64,7 @@ class SectionAssignment(models.Model):
     def is_active(self):
         return not self.end_date or self.end_date >= timezone.now().date()
 
-class SectionSlot(OrderedModelMixin, models.Model):
+class SectionSlot(OrderedModelMixin, LoadedValuesMixin, models.Model):
     name = models.CharField(max_length=50)
     section = models.ForeignKey(Section, on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
@@ -74,6 +76,7 @@ class SectionSlot(OrderedModelMixin, models.Model):
     ]
     colour = models.CharField(max_length=10, null=True, blank=True, choices=COLOUR_CHOICES)
     _order_scope_fields = ["section"]
+    _tracked_fields = ["user_id"]
 
     class Meta:
         ordering = ['section', 'order']
@@ -88,12 +91,14 @@ class SectionSlot(OrderedModelMixin, models.Model):
         return f"{self.section} - {self.name}"
 
 
-class RoleSlotAssignment(models.Model):
+class RoleSlotAssignment(LoadedValuesMixin, models.Model):
     role = models.ForeignKey(Role, on_delete=models.CASCADE)
     section_slot = models.ForeignKey(SectionSlot, on_delete=models.CASCADE)
     start_date = models.DateTimeField(default=timezone.now)
     end_date = models.DateTimeField(null=True, blank=True)
 
+    _tracked_fields = ["section_slot_id"]
+
     def __str__(self):
         return f"{self.section_slot} - {self.role}"
 
@@ -1,3 +1,4 @@
+import bisect
 import datetime
 
 from django.conf import settings
@@ -5,6 +6,7 @@ from django.db import models, transaction
 from django.db.models import Q
 from django.utils import timezone
 
+from orbat.cache import invalidate_orbat_cache
 from orbat.models import Section, Role
 from users.models import UserStatus
 
@@ -22,6 +24,9 @@ class BaseHistoryModel(models.Model):
     class Meta:
         abstract = True
         ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=["user", "start_date", "end_date"]),
+        ]
 
     def is_active(self, date=None):
         if date is None:
@@ -94,6 +99,136 @@ class BaseHistoryModel(models.Model):
             return super().save(*args, **kwargs)
 
 
+    # --- Bulk timeline rewrite ---
+
+    @classmethod
+    def _value_fields(cls):
+        skip = {"id", "user", "start_date", "end_date", "created_at", "updated_at"}
+        return [f for f in cls._meta.concrete_fields if f.name not in skip]
+
+    @classmethod
+    def bulk_apply_intervals(cls, user, records):
+        """
+        Apply many history records for one user in a fixed number of queries.
+        Records are dicts of model field values with `start_date` and an
+        optional `end_date`, applied in order so later records win where they
+        overlap. The merged, non-overlapping timeline is computed in memory
+        and written with one delete, one bulk_update and one bulk_create.
+        Unlike save(), a record inside an existing interval splits it
+        instead of dropping the remainder.
+        Returns the resulting rows ordered by start_date.
+        """
+        one_day = datetime.timedelta(days=1)
+        value_fields = cls._value_fields()
+        value_attnames = [f.attname for f in value_fields]
+        track_attnames = [cls._meta.get_field(f).attname for f in cls.non_overlapping_fields]
+
+        def as_date(value):
+            return value.date() if isinstance(value, datetime.datetime) else value
+
+        def overlaps(interval, start, end):
+            return (interval["end"] is None or interval["end"] >= start) and (end is None or interval["start"] <= end)
+
+        with transaction.atomic():
+            existing = {obj.pk: obj for obj in cls.objects.select_for_update().filter(user=user)}
+
+            # track key -> list of {"start", "end", "values", "pk"}
+            tracks = {}
+            for obj in existing.values():
+                values = {a: getattr(obj, a) for a in value_attnames}
+                key = tuple(values[a] for a in track_attnames)
+                tracks.setdefault(key, []).append({
+                    "start": obj.start_date, "end": obj.end_date, "values": values, "pk": obj.pk,
+                })
+
+            for record in records:
+                record = dict(record)
+                start = as_date(record.pop("start_date"))
+                end = as_date(record.pop("end_date", None))
+                if end is not None and end < start:
+                    raise ValueError(f"end_date {end} is before start_date {start}")
+                if end is not None and start == end:
+                    continue  # Same-day ranges are never stored, see _delete_if_zero_length
+
+                template = cls(user=user, start_date=start, end_date=end, **record)
+                values = {a: getattr(template, a) for a in value_attnames}
+                key = tuple(values[a] for a in track_attnames)
+
+                painted = []
+                reuse_pk = None
+                for interval in tracks.get(key, []):
+                    if not overlaps(interval, start, end):
+                        painted.append(interval)
+                        continue
+                    if reuse_pk is None and interval["values"] == values:
+                        # Re-applying known data updates the row rather than replacing it
+                        reuse_pk = interval["pk"]
+                    # Keep whatever sticks out either side of the new record
+                    if interval["start"] < start:
+                        painted.append({**interval, "end": start - one_day})
+                    if end is not None and (interval["end"] is None or interval["end"] > end):
+                        painted.append({**interval, "start": end + one_day})
+                painted.append({"start": start, "end": end, "values": values, "pk": reuse_pk})
+                tracks[key] = painted
+
+            # Merge touching intervals with identical values and assign rows
+            used_pks = set()
+            final = []
+            for intervals in tracks.values():
+                merged = []
+                for interval in sorted(intervals, key=lambda i: i["start"]):
+                    previous = merged[-1] if merged else None
+                    if (
+                        previous
+                        and previous["end"] is not None
+                        and previous["end"] + one_day == interval["start"]
+                        and previous["values"] == interval["values"]
+                    ):
+                        previous["end"] = interval["end"]
+                        previous["pk"] = previous["pk"] or interval["pk"]
+                    else:
+                        merged.append(dict(interval))
+                for interval in merged:
+                    if interval["pk"] in used_pks:
+                        interval["pk"] = None
+                    if interval["pk"]:
+                        used_pks.add(interval["pk"])
+                final.extend(merged)
+
+            now = timezone.now()
+            to_update, to_create, result = [], [], []
+            for interval in final:
+                obj = existing.get(interval["pk"]) or cls(user=user)
+                changed = (
+                    obj.start_date != interval["start"]
+                    or obj.end_date != interval["end"]
+                    or any(getattr(obj, a) != v for a, v in interval["values"].items())
+                )
+                obj.start_date, obj.end_date = interval["start"], interval["end"]
+                for attname, value in interval["values"].items():
+                    setattr(obj, attname, value)
+                if not obj.pk:
+                    to_create.append(obj)
+                elif changed:
+                    obj.updated_at = now
+                    to_update.append(obj)
+                result.append(obj)
+
+            stale_pks = set(existing) - used_pks
+            if stale_pks:
+                cls.objects.filter(pk__in=stale_pks).delete()
+            if to_update:
+                cls.objects.bulk_update(
+                    to_update, ["start_date", "end_date", "updated_at"] + [f.name for f in value_fields],
+                )
+            cls.objects.bulk_create(to_create)
+            if stale_pks or to_update or to_create:
+                # bulk writes skip the post_save receivers in orbat.signals
+                invalidate_orbat_cache()
+
+        return sorted(result, key=lambda obj: obj.start_date)
+
+
 class HistorySectionAssignment(BaseHistoryModel):
     section = models.ForeignKey(Section, on_delete=models.CASCADE)
 
@@ -114,28 +249,95 @@ class HistoryUserStatus(BaseHistoryModel):
         return f"{self.user.display_name} - {self.get_status_display()} - {self.start_date} to {self.end_date or "present}"})"
 
 
-def get_section_on_date(user, date):
-    assignment = (
-        HistorySectionAssignment.objects
-        .select_related("section")
-        .filter(user=user, start_date__lte=date)
-        .filter(Q(end_date__isnull=True) | Q(end_date__gte=date))
-        .first()
-    )
-    return assignment.section if assignment else None
+class HistoryResolver:
+    """
+    Answers many "as of" lookups against the history tables at once.
+    Built from (user, date) pairs, it loads each history table with a single
+    query covering every user and the whole date range, then resolves each
+    lookup with a bisect over that user's sorted intervals.
+    Lookups outside the loaded users or range fall back to a direct query.
+    """
 
+    def __init__(self, pairs):
+        pairs = [(user, self._as_date(date)) for user, date in pairs]
+        self._users = {user.pk: user for user, _ in pairs}
+        dates = [date for _, date in pairs]
+        self._min_date = min(dates, default=None)
+        self._max_date = max(dates, default=None)
+        self._indexes = {}
 
-def get_display_name_on_date(user, date):
-    name_record = (
-        HistoryUsername.objects
-        .filter(user=user, start_date__lte=date)
-        .filter(Q(end_date__isnull=True) | Q(end_date__gte=date))
-        .first()
-    )
+    @staticmethod
+    def _as_date(value):
+        if isinstance(value, datetime.datetime):
+            return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+        return value
+
+    def _covers(self, user, date):
+        return user.pk in self._users and self._min_date <= date <= self._max_date
+
+    def _history_qs(self, model):
+        qs = model.objects.all()
+        if model is HistorySectionAssignment:
+            qs = qs.select_related("section")
+        return qs
+
+    def _get_index(self, model):
+        """{user_id: ([start_date, ...], [row, ...])} for one history table, loaded once"""
+        if model not in self._indexes:
+            rows = (
+                self._history_qs(model)
+                .filter(user_id__in=self._users, start_date__lte=self._max_date)
+                .filter(Q(end_date__isnull=True) | Q(end_date__gte=self._min_date))
+                .order_by("user_id", "start_date")
+            )
+            index = {}
+            for row in rows:
+                starts, records = index.setdefault(row.user_id, ([], []))
+                starts.append(row.start_date)
+                records.append(row)
+            self._indexes[model] = index
+        return self._indexes[model]
+
+    def _resolve(self, model, user, date):
+        date = self._as_date(date)
+        if not self._covers(user, date):
+            return (
+                self._history_qs(model)
+                .filter(user=user, start_date__lte=date)
+                .filter(Q(end_date__isnull=True) | Q(end_date__gte=date))
+                .first()
+            )
 
-    display_name = name_record.display_name if name_record else user.display_name
+        starts, records = self._get_index(model).get(user.pk, ([], []))
+        position = bisect.bisect_right(starts, date) - 1
+        if position < 0:
+            return None
+        record = records[position]
+        if record.end_date is not None and record.end_date < date:
+            return None
+        return record
 
-    section = get_section_on_date(user, date.date())
-    section_shorthand = getattr(section, "shorthand", None)
+    def section_on(self, user, date):
+        assignment = self._resolve(HistorySectionAssignment, user, date)
+        return assignment.section if assignment else None
 
-    return f"[{section_shorthand}] {display_name}" if section_shorthand else display_name
\ No newline at end of file
+    def username_on(self, user, date):
+        record = self._resolve(HistoryUsername, user, date)
+        return record.username if record else user.display_name
+
+    def status_on(self, user, date):
+        record = self._resolve(HistoryUserStatus, user, date)
+        return record.status if record else None
+
+    def display_name_on(self, user, date):
+        display_name = self.username_on(user, date)
+        section_shorthand = getattr(self.section_on(user, date), "shorthand", None)
+        return f"[{section_shorthand}] {display_name}" if section_shorthand else display_name
+
+
+def get_section_on_date(user, date):
+    return HistoryResolver([(user, date)]).section_on(user, date)
+
+
+def get_display_name_on_date(user, date):
+    return HistoryResolver([(user, date)]).display_name_on(user, date)
@@ -0,0 +1,185 @@
+import datetime
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from orbat.cache import get_orbat_version, has_uncommitted_changes
+from orbat.models import (
+    Section, HistorySectionAssignment, HistoryRoleAssignment, HistoryUsername, HistoryUserStatus,
+)
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+class HistoricalRoster:
+    """
+    The unit roster as it stood on a past date, rebuilt from the history tables.
+    Each member is {"user", "username", "status", "section", "roles"}.
+    """
+
+    def __init__(self, date, sections, members):
+        self.date = date
+        self.sections = sections
+        self.members = members
+
+    def get_section(self, section_id):
+        return self.sections.get(section_id)
+
+    @property
+    def unassigned(self):
+        return [m for m in self.members.values() if m["section"] is None]
+
+    def section_context(self, section_id):
+        """Context used by the section history page"""
+        node = self.sections.get(section_id)
+        return {
+            "roster_date": self.date,
+            "roster_members": node["members"] if node else [],
+        }
+
+    @staticmethod
+    def serialize_member(member):
+        return {
+            "user_id": str(member["user"].pk),
+            "username": member["username"],
+            "status": member["status"],
+            "section_id": member["section"].id if member["section"] else None,
+            "roles": member["roles"],
+        }
+
+    def to_dict(self):
+        return {
+            "date": self.date.isoformat(),
+            "sections": [
+                {
+                    "id": node["section"].id,
+                    "name": node["section"].name,
+                    "shorthand": node["section"].shorthand,
+                    "members": [self.serialize_member(m) for m in node["members"]],
+                }
+                for node in self.sections.values()
+            ],
+            "unassigned": [self.serialize_member(m) for m in self.unassigned],
+        }
+
+
+def _active_on(qs, date):
+    return qs.filter(start_date__lte=date).filter(Q(end_date__isnull=True) | Q(end_date__gte=date))
+
+
+def build_roster_as_of(date):
+    """
+    Rebuild the roster for `date` in five queries: sections, then each of the
+    four history tables filtered to the rows active on that date.
+    """
+    sections = list(Section.objects.select_related("platoon").order_by("platoon__order", "order"))
+    section_assignments = list(
+        _active_on(HistorySectionAssignment.objects, date).select_related("user").order_by("start_date", "id")
+    )
+    role_assignments = list(
+        _active_on(HistoryRoleAssignment.objects, date).select_related("user", "role").order_by("start_date", "id")
+    )
+    usernames = dict(_active_on(HistoryUsername.objects, date).values_list("user_id", "username"))
+    statuses = list(_active_on(HistoryUserStatus.objects, date).select_related("user"))
+
+    sections_by_id = {section.id: section for section in sections}
+    members = {}
+
+    def get_member(user):
+        if user.pk not in members:
+            members[user.pk] = {
+                "user": user,
+                "username": usernames.get(user.pk, user.display_name),
+                "status": None,
+                "section": None,
+                "roles": [],
+            }
+        return members[user.pk]
+
+    for record in statuses:
+        get_member(record.user)["status"] = record.status
+    for record in section_assignments:
+        get_member(record.user)["section"] = sections_by_id.get(record.section_id)
+    for record in role_assignments:
+        name = record.role_name_at_assignment or (record.role.name if record.role else "")
+        if name:
+            get_member(record.user)["roles"].append(name)
+
+    section_nodes = {section.id: {"section": section, "members": []} for section in sections}
+    for member in sorted(members.values(), key=lambda m: m["username"].lower()):
+        if member["section"]:
+            section_nodes[member["section"].id]["members"].append(member)
+
+    return HistoricalRoster(date=date, sections=section_nodes, members=members)
+
+
+def get_roster_as_of(date):
+    """
+    HistoricalRoster for `date`, served from a per-process LRU of recent
+    rosters keyed on (date, ORBAT version). ORBAT_ROSTER_CACHE_SIZE sets its size.
+    """
+    if isinstance(date, datetime.datetime):
+        date = timezone.localdate(date) if timezone.is_aware(date) else date.date()
+    if has_uncommitted_changes():
+        return build_roster_as_of(date)
+
+    key = (date, get_orbat_version())
+    with _lru_lock:
+        roster = _lru.get(key)
+        if roster is not None:
+            _lru.move_to_end(key)
+            return roster
+
+    roster = build_roster_as_of(date)
+
+    with _lru_lock:
+        _lru[key] = roster
+        _lru.move_to_end(key)
+        while len(_lru) > getattr(settings, "ORBAT_ROSTER_CACHE_SIZE", 32):
+            _lru.popitem(last=False)
+    return roster
+
+
+def diff_rosters(before, after):
+    """
+    List the changes between two rosters, one dict per change:
+    {"user_id", "username", "type", "before", "after"} where type is one of
+    joined, left, section, username, status or roles.
+    """
+    changes = []
+
+    def add(member, change_type, old, new):
+        changes.append({
+            "user_id": str(member["user"].pk),
+            "username": member["username"],
+            "type": change_type,
+            "before": old,
+            "after": new,
+        })
+
+    def section_name(member):
+        return member["section"].name if member["section"] else None
+
+    for user_id, new in after.members.items():
+        old = before.members.get(user_id)
+        if old is None:
+            add(new, "joined", None, section_name(new))
+            continue
+        if section_name(old) != section_name(new):
+            add(new, "section", section_name(old), section_name(new))
+        if old["username"] != new["username"]:
+            add(new, "username", old["username"], new["username"])
+        if old["status"] != new["status"]:
+            add(new, "status", old["status"], new["status"])
+        if sorted(old["roles"]) != sorted(new["roles"]):
+            add(new, "roles", old["roles"], new["roles"])
+
+    for user_id, old in before.members.items():
+        if user_id not in after.members:
+            add(old, "left", section_name(old), None)
+
+    return sorted(changes, key=lambda c: (c["username"].lower(), c["type"]))
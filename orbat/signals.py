@@ -1,104 +1,265 @@
 from django.db.models import Q
-from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
 from django.dispatch import receiver
 from django.utils import timezone
 
-from orbat.models import SectionAssignment, SectionSlot, RoleSlotAssignment
+from core.signals import ordering_changed
+from core.transactions import get_commit_buffer, get_commit_buffers
+from orbat.cache import invalidate_orbat_cache
+from timeline.models import TimelineTypes
+from timeline.utils import add_entry, add_slot_entry
+from orbat.models import SectionAssignment, SectionSlot, RoleSlotAssignment, Platoon, Section, Role, \
+    HistorySectionAssignment, HistoryRoleAssignment, HistoryUsername, HistoryUserStatus
 from users.models import UserStatus, CustomUser
 
+# User fields rendered by the cached ORBAT
+ORBAT_USER_FIELDS = {"display_name", "rank", "section_name", "callsign", "status"}
+
 
 def update_user_section_fields(user: CustomUser):
     """Update rank + section from assignments and roles"""
-    if user.status == UserStatus.RETIRED:
-        user.rank = None
-        user.section_name = None
-    else:
-        assignment = SectionAssignment.objects.filter(
-            user=user,
-            end_date__isnull=True
-        ).first()
-        user.rank = "PVT"
-        if assignment and assignment.section:
-            user.section_name = assignment.section.name
-            section_slot = SectionSlot.objects.filter(
-                section=assignment.section,
-                user=user
-            ).first()
-            if section_slot:
-                role_assignment = RoleSlotAssignment.objects.filter(
-                    section_slot=section_slot,
-                    role__is_rank=True,
-                ).filter(
-                    Q(end_date__isnull=True) | Q(end_date__gt=timezone.now())
-                ).select_related("role").first()
-                if role_assignment:
-                    user.rank = role_assignment.role.shorthand
+    update_users_section_fields([user.pk])
+
+
+def update_users_section_fields(user_ids):
+    """
+    Recompute rank + section for many users with a fixed number of queries
+    and write the changed rows back with a single bulk_update.
+    """
+    users = list(CustomUser.objects.filter(pk__in=user_ids))
+    if not users:
+        return
+
+    # First active assignment per user, matching the old .first() by pk
+    assignment_by_user = {}
+    for assignment in (
+        SectionAssignment.objects.filter(user__in=users, end_date__isnull=True)
+        .select_related("section")
+        .order_by("-pk")
+    ):
+        assignment_by_user[assignment.user_id] = assignment
+
+    slot_by_key = {}
+    for slot_id, section_id, user_id in (
+        SectionSlot.objects.filter(user__in=users)
+        .order_by("-section", "-order")
+        .values_list("id", "section_id", "user_id")
+    ):
+        slot_by_key[(section_id, user_id)] = slot_id
+
+    rank_by_slot = {}
+    for slot_id, shorthand in (
+        RoleSlotAssignment.objects.filter(
+            section_slot__in=slot_by_key.values(),
+            role__is_rank=True,
+        ).filter(
+            Q(end_date__isnull=True) | Q(end_date__gt=timezone.now())
+        ).order_by("-pk").values_list("section_slot_id", "role__shorthand")
+    ):
+        rank_by_slot[slot_id] = shorthand
+
+    changed = []
+    for user in users:
+        rank, section_name = "PVT", None
+        if user.status == UserStatus.RETIRED:
+            rank = None
         else:
-            user.section_name = None
-    user.save(update_fields=["rank", "section_name"])
-
-def cache_old_user(instance):
-    if instance.pk:
-        Model = type(instance)
-        try:
-            old_instance = Model.objects.get(pk=instance.pk)
-            instance._old_user = old_instance.user if old_instance else None
-        except Model.DoesNotExist:
-            instance._old_user = None
-    else:
-        instance._old_user = None
+            assignment = assignment_by_user.get(user.pk)
+            if assignment:
+                section_name = assignment.section.name
+                slot_id = slot_by_key.get((assignment.section_id, user.pk))
+                rank = rank_by_slot.get(slot_id, rank)
 
+        if (user.rank, user.section_name) != (rank, section_name):
+            user.rank, user.section_name = rank, section_name
+            changed.append(user)
 
-def log_assignment_change(user, action, source, obj):
-    pass
+    if changed:
+        CustomUser.objects.bulk_update(changed, ["rank", "section_name"])
+        # bulk_update skips post_save, so invalidate the cached ORBAT here
+        invalidate_orbat_cache()
 
 
-def handle_user_update(instance, source=None, new_user=None):
-    new_user = new_user if new_user is not None else getattr(instance, "user", None)
-    old_user = getattr(instance, "_old_user", None)
+class DirtyUsers:
+    """Users (or slots holding users) whose rank/section need recomputing"""
 
-    if old_user and old_user != new_user:
-        update_user_section_fields(old_user)
-        if source:
-            log_assignment_change(user=old_user, action="removed", source=source, obj=instance)
-    if new_user:
-        update_user_section_fields(new_user)
-        if source:
-            log_assignment_change(user=new_user, action="added", source=source, obj=instance)
+    def __init__(self):
+        self.user_ids = set()
+        self.slot_ids = set()
 
-# --- SectionAssignment ---
+    def flush(self):
+        # Savepoints each queue their own set; the first flush on commit takes
+        # the others too, so every user is recomputed at most once
+        user_ids, slot_ids = set(self.user_ids), set(self.slot_ids)
+        for pending in get_commit_buffers("orbat_dirty_users"):
+            user_ids |= pending.user_ids
+            slot_ids |= pending.slot_ids
+            pending.user_ids, pending.slot_ids = set(), set()
+        self.user_ids, self.slot_ids = set(), set()
+
+        if slot_ids:
+            user_ids |= set(
+                SectionSlot.objects.filter(pk__in=slot_ids, user__isnull=False).values_list("user_id", flat=True)
+            )
+        if user_ids:
+            update_users_section_fields(user_ids)
 
-@receiver(pre_save, sender=SectionAssignment)
-def cache_old_user_section_assignment(sender, instance, **kwargs):
-    cache_old_user(instance)
 
-@receiver([post_save, post_delete], sender=SectionAssignment)
-def update_user_on_section_assignment(sender, instance, **kwargs):
-    handle_user_update(instance, source="SectionAssignment")
+def mark_users_dirty(user_ids=(), slot_ids=()):
+    """
+    Queue rank/section recomputes for users (or the users in slots).
+    Each user is recomputed at most once, when the current transaction
+    commits, or immediately in autocommit mode. Users queued inside a
+    savepoint that rolls back are dropped with it.
+    """
+    user_ids = {uid for uid in user_ids if uid}
+    slot_ids = {sid for sid in slot_ids if sid}
+    if not user_ids and not slot_ids:
+        return
 
-# --- SectionSlot ---
+    pending = get_commit_buffer("orbat_dirty_users", DirtyUsers)
+    if pending is None:
+        pending = DirtyUsers()
+        pending.user_ids, pending.slot_ids = user_ids, slot_ids
+        pending.flush()
+        return
+    pending.user_ids |= user_ids
+    pending.slot_ids |= slot_ids
 
+
+def log_assignment_change(user_id, action, source, obj):
+    """
+    Timeline entry for a user added to, removed from or ending a section
+    assignment, or added to a slot. Entries are buffered until commit.
+    """
+    if source == "SectionAssignment":
+        if action == "added":
+            add_entry(TimelineTypes.SECTION_JOINED, user_id, section=obj.section_id, related_object=obj,
+                      timestamp=obj.start_date)
+        elif action == "ended" or not obj.end_date or obj.end_date > timezone.now():
+            # Deleting an assignment that already ended was logged when it ended
+            add_entry(TimelineTypes.SECTION_LEFT, user_id, section=obj.section_id, related_object=obj,
+                      timestamp=obj.end_date if action == "ended" else None)
+    elif source == "SectionSlot" and action == "added":
+        add_entry(TimelineTypes.ROLE_ASSIGNED, user_id, section=obj.section_id, description=obj.name,
+                  related_object=obj)
+
+
+def handle_user_update(instance, source=None, new_user_id=None, old_user_id=None):
+    if old_user_id and old_user_id != new_user_id:
+        mark_users_dirty([old_user_id])
+        if source:
+            log_assignment_change(user_id=old_user_id, action="removed", source=source, obj=instance)
+    if new_user_id:
+        mark_users_dirty([new_user_id])
+        if source and new_user_id != old_user_id:
+            log_assignment_change(user_id=new_user_id, action="added", source=source, obj=instance)
+
+# --- SectionAssignment / SectionSlot ---
+
+@receiver(pre_save, sender=SectionAssignment)
 @receiver(pre_save, sender=SectionSlot)
-def cache_old_user_section_slot(sender, instance, **kwargs):
-    cache_old_user(instance)
+def cache_old_user(sender, instance, **kwargs):
+    instance._old_user_id = instance.get_loaded_value("user_id")
+    if sender is SectionAssignment:
+        instance._old_end_date = instance.get_loaded_value("end_date")
+
+@receiver(post_save, sender=SectionAssignment)
+@receiver(post_save, sender=SectionSlot)
+def update_user_on_save(sender, instance, created=False, **kwargs):
+    invalidate_orbat_cache()
+    old_user_id = getattr(instance, "_old_user_id", None)
+    handle_user_update(
+        instance,
+        source=sender.__name__,
+        new_user_id=instance.user_id,
+        old_user_id=old_user_id,
+    )
+    if (
+        sender is SectionAssignment and not created and instance.end_date
+        and getattr(instance, "_old_end_date", None) is None and old_user_id == instance.user_id
+    ):
+        log_assignment_change(user_id=instance.user_id, action="ended", source=sender.__name__, obj=instance)
 
-@receiver([post_save, post_delete], sender=SectionSlot)
-def update_user_on_section_slot_change(sender, instance, **kwargs):
-    handle_user_update(instance, source="SectionSlot")
+@receiver(post_delete, sender=SectionAssignment)
+@receiver(post_delete, sender=SectionSlot)
+def update_user_on_delete(sender, instance, **kwargs):
+    invalidate_orbat_cache()
+    handle_user_update(instance, source=sender.__name__, old_user_id=instance.user_id)
 
 # --- RoleSlotAssignment ---
 
 @receiver(pre_save, sender=RoleSlotAssignment)
-def cache_old_user_on_role_slot(sender, instance, **kwargs):
-    if instance.pk:  # existing row
-        try:
-            old_instance = RoleSlotAssignment.objects.get(pk=instance.pk)
-            instance._old_user = old_instance.section_slot.user if old_instance.section_slot else None
-        except RoleSlotAssignment.DoesNotExist:
-            instance._old_user = None
+def cache_old_slot_on_role_slot(sender, instance, **kwargs):
+    instance._old_section_slot_id = instance.get_loaded_value("section_slot_id")
 
 @receiver([post_save, post_delete], sender=RoleSlotAssignment)
 def update_user_on_role_slot(sender, instance, **kwargs):
-    section_slot = instance.section_slot
-    new_user = section_slot.user if section_slot and section_slot.user else None
-    handle_user_update(instance, source="RoleSlotAssignment", new_user=new_user)
+    invalidate_orbat_cache()
+    # Resolved to users at flush time, after the slot rows have settled
+    mark_users_dirty(slot_ids=[instance.section_slot_id, getattr(instance, "_old_section_slot_id", None)])
+
+@receiver(post_save, sender=RoleSlotAssignment)
+def log_role_assigned(sender, instance, created=False, **kwargs):
+    if created:
+        # The slot's user and the role name are looked up once when the entries are written
+        add_slot_entry(TimelineTypes.ROLE_ASSIGNED, instance.section_slot_id, instance.role_id,
+                       related_object=instance, timestamp=instance.start_date)
+
+# --- ORBAT structure ---
+
+@receiver([post_save, post_delete], sender=Platoon)
+@receiver([post_save, post_delete], sender=Section)
+@receiver([post_save, post_delete], sender=Role)
+def invalidate_on_structure_change(sender, instance, **kwargs):
+    invalidate_orbat_cache()
+
+@receiver([post_save, post_delete], sender=HistorySectionAssignment)
+@receiver([post_save, post_delete], sender=HistoryRoleAssignment)
+@receiver([post_save, post_delete], sender=HistoryUsername)
+@receiver([post_save, post_delete], sender=HistoryUserStatus)
+def invalidate_on_history_change(sender, instance, **kwargs):
+    # Historical rosters are cached against the ORBAT version too
+    invalidate_orbat_cache()
+
+@receiver(ordering_changed, sender=Platoon)
+@receiver(ordering_changed, sender=Section)
+@receiver(ordering_changed, sender=SectionSlot)
+def invalidate_on_reorder(sender, **kwargs):
+    invalidate_orbat_cache()
+
+@receiver(m2m_changed, sender=Role.allowed_sections.through)
+@receiver(m2m_changed, sender=Role.incompatible_roles.through)
+def invalidate_on_role_rules_change(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_orbat_cache()
+
+# --- User status ---
+
+@receiver(pre_save, sender=CustomUser)
+def cache_old_status(sender, instance, **kwargs):
+    instance._old_status = instance.get_loaded_value("status")
+
+@receiver(post_save, sender=CustomUser)
+def log_status_change(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or (update_fields is not None and "status" not in update_fields):
+        return
+    old_status = getattr(instance, "_old_status", None)
+    if not old_status or old_status == instance.status:
+        return
+
+    if instance.status == UserStatus.RETIRED:
+        add_entry(TimelineTypes.UNIT_LEFT, instance)
+    elif old_status == UserStatus.RETIRED:
+        add_entry(TimelineTypes.UNIT_JOINED, instance)
+    else:
+        add_entry(
+            TimelineTypes.STATUS_CHANGED, instance,
+            description=f"{UserStatus(old_status).label} to {UserStatus(instance.status).label}",
+        )
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_on_user_change(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not ORBAT_USER_FIELDS.intersection(update_fields):
+        return
+    invalidate_orbat_cache()
@@ -0,0 +1,161 @@
+from collections import defaultdict
+
+from django.db.models import Q
+from django.utils import timezone
+
+from orbat.cache import get_or_build, bump_orbat_version
+from orbat.models import Section, SectionAssignment, SectionSlot, RoleSlotAssignment
+from users.models import CustomUser, UserStatus
+
+
+class ORBATSnapshot:
+    """
+    In-memory platoon/section/slot tree for the whole ORBAT.
+    Built by `build_orbat_snapshot` in a fixed number of queries.
+    """
+
+    def __init__(self, platoons, sections, unassigned_users, built_at, expires_at=None):
+        self.platoons = platoons
+        self.sections = sections
+        self.unassigned_users = unassigned_users
+        self.built_at = built_at
+        # Earliest future end_date among the loaded assignments, if any
+        self.expires_at = expires_at
+
+    def get_section(self, section_id):
+        return self.sections.get(section_id)
+
+    def get_slot(self, section_id, slot_id):
+        section = self.sections.get(section_id)
+        if not section:
+            return None
+        return next((s for s in section["slots"] if s["slot"].id == slot_id), None)
+
+    def overview_context(self):
+        """Context used by the ORBAT overview page"""
+        platoon_groups = []
+        for platoon in self.platoons:
+            section_groups = [s for s in platoon["sections"] if s["assignments"]]
+            if section_groups:
+                platoon_groups.append({
+                    "platoon": platoon["platoon"],
+                    "sections": section_groups,
+                })
+
+        return {
+            "platoon_groups": platoon_groups,
+            "active_deltas": [u for u in self.unassigned_users if u.status == UserStatus.ACTIVE],
+            "delta_reserves": [u for u in self.unassigned_users if u.status == UserStatus.RESERVES],
+            "inactive_users": [
+                u for u in self.unassigned_users
+                if u.status not in (UserStatus.ACTIVE, UserStatus.RESERVES)
+            ],
+        }
+
+
+def build_orbat_snapshot(now=None):
+    """
+    Load platoons, sections, slots, active roles, active assignments and users
+    in five queries and assemble them into an ORBATSnapshot.
+    """
+    now = now or timezone.now()
+
+    sections = list(
+        Section.objects.select_related("platoon", "leader").order_by("platoon__order", "order")
+    )
+    active_assignments = list(
+        SectionAssignment.objects.filter(
+            Q(end_date__isnull=True) | Q(end_date__gt=now)
+        ).select_related("user").order_by("start_date", "id")
+    )
+    slots = list(SectionSlot.objects.select_related("user").order_by("section", "order"))
+    role_assignments = list(
+        RoleSlotAssignment.objects.filter(
+            Q(end_date__isnull=True) | Q(end_date__gt=now)
+        ).select_related("role")
+    )
+
+    assignments_by_section = defaultdict(list)
+    for assignment in active_assignments:
+        assignments_by_section[assignment.section_id].append(assignment)
+
+    slots_by_section = defaultdict(list)
+    for slot in slots:
+        slots_by_section[slot.section_id].append(slot)
+
+    roles_by_slot = defaultdict(list)
+    open_roles_by_slot = defaultdict(list)
+    for role_assignment in role_assignments:
+        roles_by_slot[role_assignment.section_slot_id].append(role_assignment.role)
+        if role_assignment.end_date is None:
+            open_roles_by_slot[role_assignment.section_slot_id].append(role_assignment.role)
+
+    section_nodes = {}
+    platoon_nodes = {}
+    for section in sections:
+        members = [a.user for a in assignments_by_section[section.id]]
+        member_ids = {u.id for u in members}
+        # Assignments without an end date, as returned by the section APIs
+        current_members = [a.user for a in assignments_by_section[section.id] if a.end_date is None]
+
+        slot_nodes = [
+            {
+                "slot": slot,
+                "user": slot.user if slot.user_id in member_ids else None,
+                "roles": roles_by_slot[slot.id],
+                "current_roles": open_roles_by_slot[slot.id],
+            }
+            for slot in slots_by_section[section.id]
+        ]
+
+        # Slotted members first in slot order, then anyone without a slot
+        rows = [{"sectionSlot": s["slot"].name, "user": s["user"]} for s in slot_nodes if s["user"]]
+        slotted_ids = {row["user"].id for row in rows}
+        rows.extend({"sectionSlot": "", "user": u} for u in members if u.id not in slotted_ids)
+
+        node = {
+            "section": section,
+            "slots": slot_nodes,
+            "members": members,
+            "current_members": current_members,
+            "assignments": rows,
+        }
+        section_nodes[section.id] = node
+
+        platoon_node = platoon_nodes.setdefault(
+            section.platoon_id,
+            {"platoon": section.platoon, "sections": []},
+        )
+        platoon_node["sections"].append(node)
+
+    platoons = sorted(
+        (p for key, p in platoon_nodes.items() if key is not None),
+        key=lambda p: p["platoon"].order,
+    )
+    if None in platoon_nodes:
+        platoons.append(platoon_nodes[None])
+
+    assigned_user_ids = {a.user_id for a in active_assignments}
+    unassigned_users = [
+        u for u in CustomUser.objects.order_by("display_name") if u.id not in assigned_user_ids
+    ]
+
+    end_dates = [a.end_date for a in active_assignments + role_assignments if a.end_date]
+
+    return ORBATSnapshot(
+        platoons=platoons,
+        sections=section_nodes,
+        unassigned_users=unassigned_users,
+        built_at=now,
+        expires_at=min(end_dates, default=None),
+    )
+
+
+def get_orbat_snapshot():
+    """Cached ORBATSnapshot for the current ORBAT version"""
+    snapshot = get_or_build("snapshot", build_orbat_snapshot)
+    if snapshot.expires_at and snapshot.expires_at <= timezone.now():
+        # An assignment lapsed since the snapshot was built
+        bump_orbat_version()
+        snapshot = get_or_build("snapshot", build_orbat_snapshot)
+    return snapshot
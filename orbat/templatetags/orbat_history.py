@@ -0,0 +1,22 @@
+from django import template
+
+from orbat.models.history import HistoryResolver
+
+register = template.Library()
+
+
+def _get_resolver(resolver, user, date):
+    # Without a shared resolver each lookup loads its own history rows
+    return resolver or HistoryResolver([(user, date)])
+
+
+@register.simple_tag
+def display_name_on(resolver, user, date):
+    """{% display_name_on history_resolver entry.user entry.timestamp %}"""
+    return _get_resolver(resolver, user, date).display_name_on(user, date)
+
+
+@register.simple_tag
+def section_on(resolver, user, date):
+    """{% section_on history_resolver entry.user entry.timestamp as section %}"""
+    return _get_resolver(resolver, user, date).section_on(user, date)
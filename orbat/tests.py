@@ -1,3 +1,344 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from orbat.cache import get_orbat_version, has_uncommitted_changes, invalidate_orbat_cache
+from orbat.models import Platoon, Role, RoleSlotAssignment, Section, SectionSlot, SectionAssignment, \
+    HistoryRoleAssignment, HistorySectionAssignment
+from orbat.signals import DirtyUsers
+from orbat.snapshot import build_orbat_snapshot
+from orbat.utils import get_section_slot_context
+from users.models import CustomUser
+
+
+class ORBATFixtureMixin:
+    """Helpers building platoons of sections, each with slotted members"""
+
+    def create_user(self, name):
+        return CustomUser.objects.create(username=name, display_name=name)
+
+    def create_section(self, platoon, name, members=4):
+        section = Section.objects.create(name=name, shorthand=name[:10], type="Infantry", max_size=8, platoon=platoon)
+        for i in range(members):
+            user = self.create_user(f"{name}-{i}")
+            SectionAssignment.objects.create(section=section, user=user)
+            SectionSlot.objects.create(section=section, name=f"Slot {i}", user=user)
+        return section
+
+    def create_platoon(self, name, sections=2, members=4):
+        platoon = Platoon.objects.create(name=name)
+        return platoon, [self.create_section(platoon, f"{name} {i}", members) for i in range(sections)]
+
+
+class ORBATSnapshotQueryTests(ORBATFixtureMixin, TestCase):
+
+    def test_query_count_is_constant_as_the_orbat_grows(self):
+        self.create_platoon("1 PL", sections=1, members=2)
+        # Sections, assignments, slots, role assignments and users
+        with self.assertNumQueries(5):
+            build_orbat_snapshot()
+
+        self.create_platoon("2 PL", sections=4, members=6)
+        self.create_user("unassigned")
+        with self.assertNumQueries(5):
+            build_orbat_snapshot()
+
+    def test_snapshot_places_members_in_their_slots(self):
+        _, (section,) = self.create_platoon("1 PL", sections=1, members=3)
+
+        node = build_orbat_snapshot().get_section(section.id)
+        self.assertEqual(len(node["members"]), 3)
+        self.assertEqual([row["sectionSlot"] for row in node["assignments"]], ["Slot 0", "Slot 1", "Slot 2"])
+
+
+class SectionSlotContextQueryTests(ORBATFixtureMixin, TestCase):
+
+    def add_roles(self, section, count):
+        roles = [Role.objects.create(name=f"Role {i}", shorthand=f"R{i}") for i in range(count)]
+        roles[0].incompatible_roles.add(roles[1])
+        roles[-1].allowed_sections.add(section)
+        for slot, role in zip(section.sectionslot_set.all(), roles):
+            RoleSlotAssignment.objects.create(section_slot=slot, role=role)
+        return roles
+
+    def test_query_count_is_constant_as_the_section_grows(self):
+        _, (section,) = self.create_platoon("1 PL", sections=1, members=2)
+        self.add_roles(section, 2)
+        # Role assignments, slots, roles with two prefetches and members
+        with self.assertNumQueries(6):
+            get_section_slot_context(section)
+
+        _, (section,) = self.create_platoon("2 PL", sections=1, members=8)
+        self.add_roles(section, 10)
+        with self.assertNumQueries(6):
+            context = get_section_slot_context(section)
+
+        self.assertEqual(len(context["sectionSlots"]), 8)
+        self.assertEqual(len(context["members"]), 8)
+        self.assertFalse(context["has_unallocated_members"])
+        self.assertTrue(all(len(slot["roles"]) == 1 for slot in context["sectionSlots"].values()))
+
+
+class PlatoonReorgQueryTests(ORBATFixtureMixin, TestCase):
+
+    def reorg(self, sections):
+        """Move every section's members one section along and give each first slot a rank"""
+        rank = Role.objects.create(name="Corporal", shorthand="CPL", is_rank=True)
+        assignments = {s.id: list(s.sectionassignment_set.filter(end_date__isnull=True)) for s in sections}
+        members = {section_id: [a.user for a in rows] for section_id, rows in assignments.items()}
+        now = timezone.now()
+        for section, target in zip(sections, sections[1:] + sections[:1]):
+            for assignment in assignments[section.id]:
+                assignment.end_date = now
+                assignment.save()
+            for user, slot in zip(members[section.id], target.sectionslot_set.order_by("order")):
+                SectionAssignment.objects.create(section=target, user=user)
+                slot.user = user
+                slot.save()
+            RoleSlotAssignment.objects.create(section_slot=target.sectionslot_set.order_by("order").first(), role=rank)
+
+    def flush_reorg(self, sections):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                self.reorg(sections)
+        return [callback for callback in callbacks if isinstance(getattr(callback, "__self__", None), DirtyUsers)]
+
+    def test_query_count_is_constant_as_the_platoon_grows(self):
+        _, sections = self.create_platoon("1 PL", sections=2, members=2)
+        (flush,) = self.flush_reorg(sections)
+        # Users in the touched slots, users, assignments, slots, rank roles and one bulk_update
+        with self.assertNumQueries(6):
+            flush()
+
+        _, sections = self.create_platoon("2 PL", sections=4, members=8)
+        (flush,) = self.flush_reorg(sections)
+        with self.assertNumQueries(6):
+            flush()
+
+        leader = sections[1].sectionslot_set.order_by("order").first().user
+        leader.refresh_from_db()
+        self.assertEqual((leader.rank, leader.section_name), ("CPL", sections[1].name))
+
+    def test_rolled_back_savepoint_drops_its_users(self):
+        _, (section,) = self.create_platoon("1 PL", sections=1, members=2)
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    self.reorg([section])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertFalse([c for c in callbacks if isinstance(getattr(c, "__self__", None), DirtyUsers)])
+
+
+class SectionSlotOrderingTests(ORBATFixtureMixin, TestCase):
+    """Moves stay inside the slot's own section and cost a fixed number of queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alpha = Section.objects.create(name="Alpha", shorthand="A", type="Infantry", max_size=8)
+        cls.bravo = Section.objects.create(name="Bravo", shorthand="B", type="Infantry", max_size=8)
+        for section in (cls.alpha, cls.bravo):
+            for name in "abcd":
+                SectionSlot.objects.create(section=section, name=name)
+
+    def slot(self, section, name):
+        return SectionSlot.objects.get(section=section, name=name)
+
+    def layout(self, section):
+        return "".join(SectionSlot.objects.filter(section=section).order_by("order").values_list("name", flat=True))
+
+    def orders(self, section):
+        return list(SectionSlot.objects.filter(section=section).order_by("order").values_list("order", flat=True))
+
+    def test_move_up_and_down_swap_with_the_neighbour(self):
+        slot = self.slot(self.alpha, "c")
+        # Neighbour lookup and one swapping UPDATE
+        with self.assertNumQueries(2):
+            slot.move_up()
+        self.assertEqual(self.layout(self.alpha), "acbd")
+        with self.assertNumQueries(2):
+            slot.move_down()
+        self.assertEqual(self.layout(self.alpha), "abcd")
+        self.assertEqual(self.layout(self.bravo), "abcd")
+
+    def test_moves_past_the_edges_are_no_ops(self):
+        first, last = self.slot(self.alpha, "a"), self.slot(self.alpha, "d")
+        with self.assertNumQueries(0):
+            first.move_up()
+        with self.assertNumQueries(1):
+            last.move_down()
+        self.assertEqual(self.layout(self.alpha), "abcd")
+        self.assertEqual(self.orders(self.alpha), [1, 2, 3, 4])
+
+    def test_move_to_shifts_the_slots_in_between(self):
+        slot = self.slot(self.alpha, "a")
+        # Scope max, shift of the slots in between and the slot itself
+        with self.assertNumQueries(3):
+            slot.move_to(3)
+        self.assertEqual(self.layout(self.alpha), "bcad")
+        self.slot(self.alpha, "d").move_to(1)
+        self.assertEqual(self.layout(self.alpha), "dbca")
+        self.assertEqual(self.orders(self.alpha), [1, 2, 3, 4])
+        self.assertEqual(self.layout(self.bravo), "abcd")
+
+    def test_move_to_clamps_to_the_scope(self):
+        slot = self.slot(self.alpha, "b")
+        slot.move_to(99)
+        self.assertEqual((self.layout(self.alpha), slot.order), ("acdb", 4))
+        slot.move_to(0)
+        self.assertEqual((self.layout(self.alpha), slot.order), ("bacd", 1))
+        self.assertEqual(self.orders(self.alpha), [1, 2, 3, 4])
+
+    def test_reorder_renumbers_the_scope(self):
+        d, b = self.slot(self.alpha, "d"), self.slot(self.alpha, "b")
+        # Current ids and one UPDATE ... CASE
+        with self.assertNumQueries(2):
+            SectionSlot.reorder({"section": self.alpha}, [d.pk, b.pk])
+        self.assertEqual(self.layout(self.alpha), "dbac")
+        self.assertEqual(self.orders(self.alpha), [1, 2, 3, 4])
+        self.assertEqual(self.layout(self.bravo), "abcd")
+
+    def test_reorder_rejects_ids_outside_the_scope(self):
+        other = self.slot(self.bravo, "a")
+        with self.assertRaises(ValueError):
+            SectionSlot.reorder({"section": self.alpha}, [self.slot(self.alpha, "b").pk, other.pk])
+        self.assertEqual(self.layout(self.alpha), "abcd")
+        self.assertEqual(self.layout(self.bravo), "abcd")
+
+    def test_delete_closes_the_gap_within_the_scope(self):
+        self.slot(self.alpha, "b").delete()
+        self.assertEqual(self.layout(self.alpha), "acd")
+        self.assertEqual(self.orders(self.alpha), [1, 2, 3])
+        self.assertEqual(self.orders(self.bravo), [1, 2, 3, 4])
+
+
+class HistoryIntervalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username="member", display_name="member")
+        cls.alpha = Section.objects.create(name="Alpha", shorthand="A", type="Infantry", max_size=8)
+        cls.bravo = Section.objects.create(name="Bravo", shorthand="B", type="Infantry", max_size=8)
+
+    def section_record(self, section, start, end=None):
+        return {"section": section, "start_date": start, "end_date": end}
+
+    def timeline(self, model=HistorySectionAssignment, *fields):
+        return list(
+            model.objects.filter(user=self.user).order_by("start_date", "pk")
+            .values_list(*(fields or ("section_id",)), "start_date", "end_date")
+        )
+
+    def test_inner_record_splits_an_open_interval(self):
+        HistorySectionAssignment.bulk_apply_intervals(self.user, [self.section_record(self.alpha, date(2026, 1, 1))])
+        HistorySectionAssignment.bulk_apply_intervals(
+            self.user, [self.section_record(self.bravo, date(2026, 2, 1), date(2026, 2, 28))]
+        )
+
+        self.assertEqual(self.timeline(), [
+            (self.alpha.pk, date(2026, 1, 1), date(2026, 1, 31)),
+            (self.bravo.pk, date(2026, 2, 1), date(2026, 2, 28)),
+            (self.alpha.pk, date(2026, 3, 1), None),
+        ])
+
+    def test_adjacent_intervals_with_equal_values_merge(self):
+        HistorySectionAssignment.bulk_apply_intervals(self.user, [
+            self.section_record(self.alpha, date(2026, 1, 1), date(2026, 1, 31)),
+            self.section_record(self.alpha, date(2026, 2, 1), date(2026, 2, 28)),
+            self.section_record(self.bravo, date(2026, 3, 1), date(2026, 3, 31)),
+        ])
+
+        self.assertEqual(self.timeline(), [
+            (self.alpha.pk, date(2026, 1, 1), date(2026, 2, 28)),
+            (self.bravo.pk, date(2026, 3, 1), date(2026, 3, 31)),
+        ])
+
+    def test_reapplying_the_same_records_changes_nothing(self):
+        records = [
+            self.section_record(self.alpha, date(2026, 1, 1), date(2026, 1, 31)),
+            self.section_record(self.bravo, date(2026, 2, 1)),
+        ]
+        first = HistorySectionAssignment.bulk_apply_intervals(self.user, records)
+        stored = list(HistorySectionAssignment.objects.filter(user=self.user).values_list("pk", "updated_at"))
+
+        # Savepoint, the locked read and the release: nothing is written
+        with self.assertNumQueries(3):
+            second = HistorySectionAssignment.bulk_apply_intervals(self.user, records)
+
+        self.assertEqual([obj.pk for obj in second], [obj.pk for obj in first])
+        self.assertEqual(
+            list(HistorySectionAssignment.objects.filter(user=self.user).values_list("pk", "updated_at")), stored
+        )
+
+    def test_non_overlapping_fields_keep_separate_tracks(self):
+        rifleman = Role.objects.create(name="Rifleman", shorthand="RFL")
+        medic = Role.objects.create(name="Medic", shorthand="MED")
+
+        def role_record(role, start, end=None):
+            return {"role": role, "section": self.alpha, "start_date": start, "end_date": end}
+
+        HistoryRoleAssignment.bulk_apply_intervals(self.user, [
+            role_record(rifleman, date(2026, 1, 1)),
+            role_record(medic, date(2026, 2, 1)),
+            role_record(rifleman, date(2026, 3, 1), date(2026, 3, 31)),
+        ])
+
+        # The medic record leaves the rifleman interval alone, and re-stating
+        # the rifleman role inside its own interval merges back into it
+        self.assertEqual(self.timeline(HistoryRoleAssignment, "role_id"), [
+            (rifleman.pk, date(2026, 1, 1), None),
+            (medic.pk, date(2026, 2, 1), None),
+        ])
+
+    def test_end_before_start_is_rejected(self):
+        with self.assertRaises(ValueError):
+            HistorySectionAssignment.bulk_apply_intervals(
+                self.user, [self.section_record(self.alpha, date(2026, 2, 1), date(2026, 1, 1))]
+            )
+        self.assertEqual(self.timeline(), [])
+
+    def test_query_count_is_constant_as_the_records_grow(self):
+        for months in (1, 12):
+            user = CustomUser.objects.create(username=f"member{months}", display_name=f"member{months}")
+            HistorySectionAssignment.bulk_apply_intervals(user, [
+                *(self.section_record(self.alpha, date(2026, m, 1), date(2026, m, 10)) for m in range(1, months + 1)),
+                self.section_record(self.alpha, date(2027, 1, 1)),
+            ])
+            # Replace every closed interval and split the open one: savepoint, locked read,
+            # delete (collect and delete), bulk_update, bulk_create and release
+            with self.assertNumQueries(7):
+                HistorySectionAssignment.bulk_apply_intervals(user, [
+                    *(self.section_record(self.bravo, date(2026, m, 1), date(2026, m, 10)) for m in range(1, months + 1)),
+                    self.section_record(self.bravo, date(2027, 2, 1), date(2027, 2, 10)),
+                ])
+            self.assertEqual(HistorySectionAssignment.objects.filter(user=user).count(), months + 3)
+
+
+class ORBATCacheInvalidationTests(TransactionTestCase):
+
+    def test_commit_bumps_the_version_and_clears_pending_changes(self):
+        version = get_orbat_version()
+        with transaction.atomic():
+            invalidate_orbat_cache()
+            invalidate_orbat_cache()
+            self.assertTrue(has_uncommitted_changes())
+            self.assertEqual(get_orbat_version(), version)
+
+        self.assertFalse(has_uncommitted_changes())
+        self.assertNotEqual(get_orbat_version(), version)
+
+    def test_rolled_back_savepoint_discards_pending_changes(self):
+        version = get_orbat_version()
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    invalidate_orbat_cache()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            self.assertFalse(has_uncommitted_changes())
+
+        self.assertEqual(get_orbat_version(), version)
@@ -1,5 +1,4 @@
-import json
-from collections import Counter
+from collections import Counter, defaultdict
 
 from orbat.models import RoleSlotAssignment, SectionSlot, Role, SectionAssignment, Section
 
@@ -8,52 +7,50 @@ def is_section_owner(user):
     section = Section.objects.get(leader=user)
 
 def get_section_slot_context(section):
-
+    """
+    Build the slot, role and member context for a section page.
+    Runs a fixed number of queries regardless of how many roles or slots exist.
+    """
     context = {}
-    # Active role assignments for this section
-    role_assignments = (
+    # Active role assignments for this section, grouped by slot in one pass
+    role_assignments = list(
         RoleSlotAssignment.objects.filter(
             section_slot__section=section,
             end_date__isnull=True,
-        ).select_related("role", "section_slot")
+        ).select_related("role")
     )
+    roles_by_slot = defaultdict(list)
+    for assignment in role_assignments:
+        roles_by_slot[assignment.section_slot_id].append(assignment.role)
 
     # Counts of active rank roles
     role_counts = Counter(a.role_id for a in role_assignments if a.role.is_rank)
 
     # Section slots
-    section_slots = (
+    section_slots = list(
         SectionSlot.objects.filter(section=section)
         .select_related("user")
         .order_by("order")
     )
-    slotted_ids = [slot.user.id for slot in section_slots if slot.user]
+    slotted_ids = {slot.user_id for slot in section_slots if slot.user_id}
 
     # Preload role metadata
-    all_roles = list(Role.objects.all())
-    role_allowed_sections_map = {
-        r.id: set(r.allowed_sections.all()) for r in all_roles
-    }
-    role_incompatibles_map = {
-        r.id: {ir.id for ir in r.incompatible_roles.all()} for r in all_roles
-    }
+    all_roles = Role.objects.prefetch_related("allowed_sections", "incompatible_roles")
 
     # --- Roles context ---
     roles_ctx = {}
     for role in all_roles:
-        print(role.name)
-        if role.allowed_sections.exists() and not role.allowed_sections.contains(section):
+        allowed_section_ids = {s.id for s in role.allowed_sections.all()}
+        if allowed_section_ids and section.id not in allowed_section_ids:
             continue
+        incompatible_ids = {r.id for r in role.incompatible_roles.all()}
+
         max_count = role.max_per_section
         current_count = role_counts.get(role.id, 0) if role.is_rank else 0
         max_reached = max_count is not None and current_count >= max_count
-        allowed = not role_allowed_sections_map[role.id] or section in role_allowed_sections_map[role.id]
-        has_incompatible = any(
-            rid in role_incompatibles_map[role.id]
-            for rid in role_counts.keys()
-        )
+        has_incompatible = not incompatible_ids.isdisjoint(role_counts.keys())
 
-        disabled = max_reached or not allowed or has_incompatible
+        disabled = max_reached or has_incompatible
 
         roles_ctx[role.id] = {
             "id": role.id,
@@ -71,9 +68,7 @@ def get_section_slot_context(section):
     # --- Section slots context ---
     slots_ctx = {}
     for slot in section_slots:
-        assigned_roles = [
-            a.role for a in role_assignments if a.section_slot_id == slot.id
-        ]
+        assigned_roles = roles_by_slot[slot.id]
         slots_ctx[slot.id] = {
             "id": slot.id,
             "name": slot.name,
@@ -86,7 +81,7 @@ def get_section_slot_context(section):
     context['sectionSlots'] = slots_ctx
 
     # --- Members context ---
-    active_assignments = (
+    active_assignments = list(
         SectionAssignment.objects.filter(section=section, end_date__isnull=True)
         .select_related("user")
     )
@@ -4,9 +4,13 @@ from django.contrib import messages
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.serializers.json import DjangoJSONEncoder
 from django.shortcuts import get_object_or_404, render, redirect
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.views import View
 
+from orbat.cache import get_or_build
 from orbat.models import get_section_on_date, SectionSlot, Section, SectionAssignment
+from orbat.roster import get_roster_as_of, diff_rosters
 from orbat.utils import get_section_slot_context
 from orbat.views import ORBATBaseView
 
@@ -35,12 +39,59 @@ class ORBATSectionDetailView(ORBATBaseView):
         ]
         context["section"] = self.section_obj
         context["can_manage"] = self.section_obj.can_manage(user)
-        section_context = get_section_slot_context(self.section_obj)
+        section_context = get_or_build(
+            f"section:{self.section_obj.pk}:slot_context",
+            lambda: get_section_slot_context(self.section_obj),
+        )
         context.update(section_context)
         return context
 
 class ORBATSectionHistoryView(ORBATBaseView):
-    pass
+    template_name = 'orbat_section_history.html'
+
+    def dispatch(self, request, *args, **kwargs):
+        section_name = self.kwargs.get('section_name')
+        try:
+            self.section_obj = Section.objects.get(name=section_name)
+        except ObjectDoesNotExist:
+            messages.error(self.request, f'Section {section_name} not found')
+            return redirect("/orbat")
+
+        return super().dispatch(request, *args, **kwargs)
+
+    def _get_date(self, name, default=None):
+        try:
+            return parse_date(self.request.GET.get(name) or "") or default
+        except ValueError:
+            return default
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        context["breadcrumbs"] = [
+            {"name": "ORBAT", "url": "/orbat/"},
+            {"name": self.section_obj.name, "url": f"/orbat/section/{self.section_obj.name}/"},
+            {"name": "History", "url": None},
+        ]
+        context["section"] = self.section_obj
+
+        date = self._get_date("date", timezone.localdate())
+        roster = get_roster_as_of(date)
+        context.update(roster.section_context(self.section_obj.id))
+
+        since = self._get_date("since")
+        if since:
+            before = get_roster_as_of(since)
+            member_ids = {
+                str(m["user"].pk)
+                for r in (before, roster)
+                for m in r.section_context(self.section_obj.id)["roster_members"]
+            }
+            context["roster_since"] = since
+            context["roster_changes"] = [
+                c for c in diff_rosters(before, roster) if c["user_id"] in member_ids
+            ]
+        return context
 
 class ORBATSectionEditView(ORBATBaseView):
     pass
\ No newline at end of file
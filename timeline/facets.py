@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from core.cache import get_version, bump_version, queryset_key
+
+FACET_RANGES = [
+    ('last_week', 7),
+    ('last_month', 30),
+    ('last_3_months', 90),
+    ('last_6_months', 180),
+    ('last_year', 365),
+]
+
+
+def bump_timeline_version():
+    bump_version("timeline")
+
+
+def build_timeline_facets(timeline_qs, today=None):
+    """
+    Distinct users and sections and per-range entry counts for a timeline
+    queryset, in three aggregate queries without loading any entries.
+    """
+    from orbat.models import Section
+    User = get_user_model()
+    today = today or timezone.now().date()
+
+    timeline_qs = timeline_qs.order_by()
+    users = (
+        User.objects.filter(pk__in=timeline_qs.values("user_id").distinct())
+        .order_by("display_name")
+        .values("pk", "display_name")
+    )
+    sections = (
+        Section.objects.filter(pk__in=timeline_qs.filter(section__isnull=False).values("section_id").distinct())
+        .order_by("name")
+        .values("pk", "name")
+    )
+
+    starts = [(label, today - timedelta(days=days)) for label, days in FACET_RANGES]
+    counts = timeline_qs.aggregate(**{
+        label: Count("id", filter=Q(timestamp__gte=timezone.make_aware(datetime.combine(start, datetime.min.time()))))
+        for label, start in starts
+    })
+
+    return {
+        "users": list(users),
+        "sections": list(sections),
+        "ranges": [(label, start, counts[label]) for label, start in starts],
+    }
+
+
+def get_timeline_facets(timeline_qs):
+    """
+    build_timeline_facets for `timeline_qs`, cached per scope until a timeline
+    entry changes. The scope is identified by the queryset's SQL.
+    """
+    today = timezone.now().date()
+    scope = queryset_key(timeline_qs)
+    if scope is None:
+        # Scoped to nothing, e.g. an empty user set
+        return build_timeline_facets(timeline_qs, today)
+    key = f"timeline:{get_version('timeline')}:facets:{today.isoformat()}:{scope}"
+
+    facets = cache.get(key)
+    if facets is None:
+        facets = build_timeline_facets(timeline_qs, today)
+        cache.set(key, facets, getattr(settings, "TIMELINE_FACETS_TIMEOUT", 300))
+    return facets
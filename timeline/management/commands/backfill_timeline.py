@@ -0,0 +1,164 @@
+import time
+from datetime import datetime
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orbat.models import HistorySectionAssignment, HistoryRoleAssignment, HistoryUserStatus
+from timeline.facets import bump_timeline_version
+from timeline.models import TimelineEntry, TimelineTypes
+from users.models import UserStatus
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate timeline entries from the ORBAT history tables. "
+        "Entries are keyed on (history row, event type) so re-running skips what already exists. "
+        "Section and role backfills resume from their own --after-*-id; statuses are always read from "
+        "the start, as each status is compared with the user's previous one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows read and written per batch")
+        parser.add_argument(
+            "--only", choices=["sections", "roles", "statuses"], action="append",
+            help="Limit the backfill to some history tables (repeatable)",
+        )
+        parser.add_argument(
+            "--after-section-id", type=int, default=0,
+            help="Resume the section backfill after this HistorySectionAssignment id",
+        )
+        parser.add_argument(
+            "--after-role-id", type=int, default=0,
+            help="Resume the role backfill after this HistoryRoleAssignment id",
+        )
+        parser.add_argument(
+            "--before", type=lambda value: datetime.strptime(value, "%Y-%m-%d").date(),
+            help="Only backfill events before this date (YYYY-MM-DD), e.g. when live entries start",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Count entries without writing them")
+
+    def handle(self, *args, **options):
+        self.chunk_size = options["chunk_size"]
+        self.before = options["before"]
+        self.dry_run = options["dry_run"]
+        only = options["only"] or ["sections", "roles", "statuses"]
+
+        total = 0
+        if "sections" in only:
+            total += self.backfill(
+                HistorySectionAssignment,
+                HistorySectionAssignment.objects.filter(pk__gt=options["after_section_id"]).order_by("pk")
+                .values("pk", "user_id", "section_id", "start_date", "end_date"),
+                self.section_events,
+            )
+        if "roles" in only:
+            total += self.backfill(
+                HistoryRoleAssignment,
+                HistoryRoleAssignment.objects.filter(pk__gt=options["after_role_id"]).order_by("pk")
+                .values("pk", "user_id", "section_id", "start_date", "role_name_at_assignment", "role__name"),
+                self.role_events,
+            )
+        if "statuses" in only:
+            # Ordered per user so each interval can be compared with the one before it. That needs
+            # every earlier row, so there is no resume point; existing entries are skipped instead.
+            self.previous_status = (None, None)
+            total += self.backfill(
+                HistoryUserStatus,
+                HistoryUserStatus.objects.order_by("user_id", "start_date", "pk")
+                .values("pk", "user_id", "start_date", "status"),
+                self.status_events,
+            )
+
+        if total and not self.dry_run:
+            bump_timeline_version()
+        verb = "Would create" if self.dry_run else "Created"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total} timeline entries"))
+
+    # --- Event derivation ---
+
+    def _timestamp(self, date):
+        return timezone.make_aware(datetime.combine(date, datetime.min.time()))
+
+    def _include(self, date):
+        return date is not None and (self.before is None or date < self.before)
+
+    def section_events(self, row):
+        if self._include(row["start_date"]):
+            yield TimelineTypes.SECTION_JOINED, row["start_date"], {"section_id": row["section_id"]}
+        if self._include(row["end_date"]):
+            yield TimelineTypes.SECTION_LEFT, row["end_date"], {"section_id": row["section_id"]}
+
+    def role_events(self, row):
+        if self._include(row["start_date"]):
+            yield TimelineTypes.ROLE_ASSIGNED, row["start_date"], {
+                "section_id": row["section_id"],
+                "description": row["role_name_at_assignment"] or row["role__name"] or "",
+            }
+
+    def status_events(self, row):
+        previous_user_id, previous_status = self.previous_status
+        if previous_user_id != row["user_id"]:
+            previous_status = None
+        self.previous_status = (row["user_id"], row["status"])
+
+        if not self._include(row["start_date"]):
+            return
+        if row["status"] == UserStatus.RETIRED:
+            yield TimelineTypes.UNIT_LEFT, row["start_date"], {}
+        elif previous_status in (None, UserStatus.RETIRED):
+            yield TimelineTypes.UNIT_JOINED, row["start_date"], {}
+
+    # --- Streaming ---
+
+    def backfill(self, model, rows, derive):
+        content_type = ContentType.objects.get_for_model(model)
+        label = model.__name__
+        started = time.monotonic()
+        read = created = 0
+
+        chunk = []
+        for row in rows.iterator(chunk_size=self.chunk_size):
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                created += self.write_chunk(content_type, chunk, derive)
+                read += len(chunk)
+                self.report(label, read, created, started, chunk[-1]["pk"])
+                chunk = []
+        if chunk:
+            created += self.write_chunk(content_type, chunk, derive)
+            read += len(chunk)
+            self.report(label, read, created, started, chunk[-1]["pk"])
+
+        return created
+
+    def write_chunk(self, content_type, chunk, derive):
+        existing = set(
+            TimelineEntry.objects.filter(content_type=content_type, object_id__in=[row["pk"] for row in chunk])
+            .values_list("object_id", "event_type")
+        )
+
+        entries = []
+        for row in chunk:
+            for event_type, date, fields in derive(row):
+                if (row["pk"], event_type) in existing:
+                    continue
+                entries.append(TimelineEntry(
+                    user_id=row["user_id"],
+                    event_type=event_type,
+                    timestamp=self._timestamp(date),
+                    content_type=content_type,
+                    object_id=row["pk"],
+                    **fields,
+                ))
+
+        if entries and not self.dry_run:
+            TimelineEntry.objects.bulk_create(entries, batch_size=self.chunk_size)
+        return len(entries)
+
+    def report(self, label, read, created, started, last_id):
+        elapsed = max(time.monotonic() - started, 0.001)
+        self.stdout.write(
+            f"{label}: {read} rows read, {created} entries, {read / elapsed:.0f} rows/s, last id {last_id}"
+        )
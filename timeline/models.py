@@ -13,6 +13,7 @@ class TimelineTypes(models.TextChoices):
     ROLE_ASSIGNED = "ROLE_ASSIGNED", "assigned to a role"
     AWARD_RECEIVED = "AWARD_RECEIVED", "received an award"
     TRAINING_COMPLETED = "TRAINING_COMPLETED", "training completed"
+    STATUS_CHANGED = "STATUS_CHANGED", "changed status"
 
 
 class TimelineEntry(models.Model):
@@ -25,9 +26,15 @@ class TimelineEntry(models.Model):
     content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.SET_NULL, null=True, blank=True)
     object_id = models.PositiveIntegerField(null=True, blank=True)
     related_object = GenericForeignKey('content_type', 'object_id')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, related_name='+', on_delete=models.SET_NULL)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['user', 'timestamp']),
+            models.Index(fields=['section', 'timestamp']),
+            models.Index(fields=['event_type', 'timestamp']),
+        ]
 
     def __str__(self):
         return f'{self.user.display_name} {self.get_event_type_display()}'
@@ -0,0 +1,127 @@
+from uuid import UUID
+
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+
+
+class TimelineScope:
+    """
+    Whose entries a timeline shows: everyone, one user, a set of users or a section.
+    `apply` adds the cheapest filter for each case, and nothing at all when unscoped.
+    """
+    ALL = "all"
+    USER = "user"
+    USERS = "users"
+    SECTION = "section"
+
+    def __init__(self, kind=ALL, user_id=None, users=None, section_id=None, user_filters=None):
+        self.kind = kind
+        self.user_id = user_id
+        # A list of user pks, or a user queryset applied as a subquery
+        self.users = users
+        self.section_id = section_id
+        # The `for_user_filters` arguments behind a queryset of users, carried in page URLs
+        self.user_filters = user_filters or {}
+
+    @classmethod
+    def all(cls):
+        return cls(cls.ALL)
+
+    @classmethod
+    def for_user(cls, user):
+        return cls(cls.USER, user_id=getattr(user, "pk", user))
+
+    @classmethod
+    def for_users(cls, users):
+        if isinstance(users, QuerySet):
+            query = users.query
+            # Only a plain User.objects.all() covers every user
+            if not query.where and not query.is_sliced and not query.combinator:
+                return cls.all()
+            return cls(cls.USERS, users=users.values("pk"))
+        user_ids = [getattr(user, "pk", user) for user in users]
+        if len(user_ids) == 1:
+            return cls.for_user(user_ids[0])
+        return cls(cls.USERS, users=user_ids)
+
+    @classmethod
+    def for_user_filters(cls, section=None, statuses=None):
+        """Users currently assigned to `section` and/or holding one of `statuses`"""
+        filters = {}
+        users = get_user_model().objects.all()
+        if section:
+            filters["section"] = getattr(section, "pk", section)
+            users = users.filter(
+                sectionassignment__section_id=filters["section"],
+                sectionassignment__end_date__isnull=True,
+            )
+        if statuses:
+            filters["statuses"] = list(statuses)
+            users = users.filter(status__in=filters["statuses"])
+        if not filters:
+            return cls.all()
+        return cls(cls.USERS, users=users.values("pk"), user_filters=filters)
+
+    @classmethod
+    def for_section(cls, section):
+        return cls(cls.SECTION, section_id=getattr(section, "pk", section))
+
+    @classmethod
+    def from_users(cls, user_qs):
+        """Scope for the user_qs values the timeline helpers accept: None, a user, a pk, a queryset or an iterable"""
+        User = get_user_model()
+        if user_qs is None:
+            return cls.all()
+        if isinstance(user_qs, cls):
+            return user_qs
+        if isinstance(user_qs, User):
+            return cls.for_user(user_qs)
+        if isinstance(user_qs, (UUID, str)):
+            return cls.for_user(user_qs)
+        return cls.for_users(user_qs)
+
+    @property
+    def is_all(self):
+        return self.kind == self.ALL
+
+    def apply(self, qs):
+        if self.kind == self.USER:
+            return qs.filter(user_id=self.user_id)
+        if self.kind == self.USERS:
+            return qs.filter(user_id__in=self.users)
+        if self.kind == self.SECTION:
+            return qs.filter(section_id=self.section_id)
+        return qs
+
+    def query_params(self):
+        """(name, value) pairs that rebuild this scope through `from_params`"""
+        if self.kind == self.USER:
+            return [("user", str(self.user_id))]
+        if self.kind == self.USERS:
+            if self.user_filters:
+                params = []
+                if "section" in self.user_filters:
+                    params.append(("scope_user_section", str(self.user_filters["section"])))
+                params.extend(("scope_user_status", status) for status in self.user_filters.get("statuses", []))
+                return params
+            if isinstance(self.users, QuerySet):
+                # Listing every pk would grow the URL with the queryset
+                raise ValueError("Queryset scopes can only be carried in a URL when built by for_user_filters")
+            return [("user", str(pk)) for pk in self.users]
+        if self.kind == self.SECTION:
+            return [("scope_section", str(self.section_id))]
+        return []
+
+    @classmethod
+    def from_params(cls, params):
+        section_id = params.get("scope_section")
+        if section_id:
+            return cls.for_section(section_id)
+        user_section = params.get("scope_user_section")
+        user_statuses = params.getlist("scope_user_status")
+        if user_section or user_statuses:
+            return cls.for_user_filters(section=user_section, statuses=user_statuses)
+        user_ids = params.getlist("user")
+        if user_ids:
+            return cls.for_users(user_ids)
+        return cls.all()
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from timeline.facets import bump_timeline_version
+from timeline.models import TimelineEntry
+
+
+@receiver([post_save, post_delete], sender=TimelineEntry)
+def invalidate_timeline_facets(sender, instance, **kwargs):
+    bump_timeline_version()
@@ -8,9 +8,10 @@ from django.utils import timezone
 from django.utils.html import format_html
 
 from timeline.models import TimelineEntry, TimelineTypes
+from timeline.scope import TimelineScope
 from timeline.utils import get_timeline_entries, get_recent_training_timeline, get_recent_orbat_timeline, \
-    build_timeline_context, group_timeline_entries, get_active_context, get_user_query, get_start_date_query, \
-    get_section_query
+    build_timeline_context, get_active_context, get_user_query, get_start_date_query, \
+    get_section_query, build_timeline_page_context
 
 register = template.Library()
 
@@ -54,24 +55,20 @@ def render_orbat_timeline(context, user_qs=None, section=None):
     active_context = get_active_context(request)
     user_query = get_user_query(user_qs, active_context["active_timeline_user"])
     section_query = get_section_query(section, active_context["active_timeline_section"])
-    default_date_range = timezone.now() - timedelta(days=90)
-    default_date_range = None
-    start_date_query = get_start_date_query(default_date_range, active_context["active_timeline_range"])
+    # No default start date, pages are loaded as the timeline is scrolled
+    start_date_query = get_start_date_query(None, active_context["active_timeline_range"])
 
-    print(active_context["active_timeline_user"])
-    print(section_query)
-    print(start_date_query)
-
-    entries = get_timeline_entries(
-        user_qs=user_query,
-        section=section_query,
-        start_date=start_date_query,
-        exclude_types=[TimelineTypes.TRAINING_COMPLETED],
-    )
+    scope = {
+        "user_qs": user_query,
+        "section": section_query,
+        "start_date": start_date_query,
+        "exclude_types": [TimelineTypes.TRAINING_COMPLETED],
+    }
+    entries = get_timeline_entries(**scope)
 
     context.update(active_context)
     context.update(build_timeline_context(entries))
-    context["entries"] = group_timeline_entries(entries)
+    context.update(build_timeline_page_context(entries, **scope))
     return context
 
 @register.inclusion_tag("timeline_list.html", takes_context=True)
@@ -79,7 +76,6 @@ def render_training_timeline(context, user_qs=None, section=None):
 
     active_context = get_active_context(context)
     active_user = active_context.get("active_timeline_user")
-    print(active_user)
     if active_user:
         User = get_user_model()
         active_user = User.objects.get(id=active_user)
@@ -95,17 +91,17 @@ def render_training_timeline(context, user_qs=None, section=None):
     entries = get_recent_training_timeline(user_qs=active_user, section=active_section)
     context = build_timeline_context(entries)
     context.update(get_active_context(context))
-    context["entries"] = group_timeline_entries(entries)
+    context.update(build_timeline_page_context(
+        entries,
+        user_qs=active_user,
+        section=active_section,
+        start_date=timezone.now() - timedelta(days=180),
+        event_types=[TimelineTypes.TRAINING_COMPLETED],
+    ))
     return context
 
 @register.inclusion_tag("timeline_list.html")
 def render_timeline(user_qs=None, section=None, start_date=None, end_date=None):
-    User = get_user_model()
-    if user_qs is None:
-        user_qs = User.objects.all()
-    elif isinstance(user_qs, User):
-        user_qs = User.objects.filter(pk=user_qs.pk)
-    elif isinstance(user_qs, list):
-        user_qs = User.objects.filter(pk__in=[u.pk for u in user_qs])
-    entries = get_timeline_entries(user_qs, section, start_date, end_date)
-    return {"entries": group_timeline_entries(entries)}
\ No newline at end of file
+    scope = {"user_qs": TimelineScope.from_users(user_qs), "section": section, "start_date": start_date, "end_date": end_date}
+    entries = get_timeline_entries(**scope)
+    return build_timeline_page_context(entries, **scope)
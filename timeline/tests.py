@@ -1,3 +1,100 @@
-from django.test import TestCase
+import os
+from datetime import timedelta
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from orbat.models import Section
+from timeline.models import TimelineEntry, TimelineTypes
+from timeline.scope import TimelineScope
+from timeline.utils import add_entry, get_timeline_entries, get_timeline_page
+from users.models import CustomUser
+
+# Raise to benchmark against a production-sized timeline, e.g. 100000 or 1000000
+BENCHMARK_ROWS = int(os.environ.get("TIMELINE_BENCHMARK_ROWS", 2000))
+
+
+class TimelineScopeTests(TestCase):
+
+    def test_unfiltered_queryset_is_the_all_scope(self):
+        self.assertTrue(TimelineScope.for_users(CustomUser.objects.all()).is_all)
+
+    def test_sliced_or_combined_queryset_keeps_its_users(self):
+        sliced = TimelineScope.for_users(CustomUser.objects.order_by("pk")[:5])
+        combined = TimelineScope.for_users(CustomUser.objects.all().union(CustomUser.objects.all()))
+        self.assertEqual(sliced.kind, TimelineScope.USERS)
+        self.assertEqual(combined.kind, TimelineScope.USERS)
+
+
+class TimelineScopeBenchmarkTests(TestCase):
+    """One timeline page per scope kind over BENCHMARK_ROWS entries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [CustomUser.objects.create(username=f"user{i}", display_name=f"user{i}") for i in range(20)]
+        cls.section = Section.objects.create(name="1 Section", shorthand="1", type="Infantry", max_size=8)
+        start = timezone.now() - timedelta(days=365)
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(
+                    user=cls.users[i % len(cls.users)],
+                    section=cls.section if i % 3 == 0 else None,
+                    timestamp=start + timedelta(minutes=i),
+                    event_type=TimelineTypes.ROLE_ASSIGNED,
+                )
+                for i in range(BENCHMARK_ROWS)
+            ),
+            batch_size=5000,
+        )
+
+    def fetch_page(self, user_qs=None, section=None):
+        with CaptureQueriesContext(connection) as queries:
+            page = get_timeline_page(get_timeline_entries(user_qs=user_qs, section=section))
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(page["entries"])
+        return queries[0]["sql"]
+
+    def test_unscoped_page_skips_the_user_filter(self):
+        sql = self.fetch_page(CustomUser.objects.all())
+        self.assertNotIn("WHERE", sql)
+
+    def test_single_user_page_filters_on_the_user_column(self):
+        sql = self.fetch_page(self.users[0])
+        self.assertNotIn("SELECT U0", sql)
+        self.assertIn('"timeline_timelineentry"."user_id" =', sql)
+
+    def test_user_set_page_filters_on_a_list_of_pks(self):
+        sql = self.fetch_page(self.users[:5])
+        self.assertNotIn("SELECT U0", sql)
+
+    def test_filtered_queryset_page_uses_one_subquery(self):
+        sql = self.fetch_page(CustomUser.objects.filter(username__startswith="user1"))
+        self.assertEqual(sql.count("SELECT"), 2)
+
+    def test_section_page_filters_on_the_section_column(self):
+        sql = self.fetch_page(TimelineScope.for_section(self.section))
+        self.assertNotIn("SELECT U0", sql)
+        self.assertIn('"timeline_timelineentry"."section_id" =', sql)
+
+
+class TimelineWriterTransactionTests(TransactionTestCase):
+
+    def test_entries_from_a_rolled_back_savepoint_are_dropped(self):
+        user = CustomUser.objects.create(username="user", display_name="user")
+        with transaction.atomic():
+            add_entry(TimelineTypes.STATUS_CHANGED, user, description="kept")
+            try:
+                with transaction.atomic():
+                    add_entry(TimelineTypes.STATUS_CHANGED, user, description="rolled back")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            with transaction.atomic():
+                add_entry(TimelineTypes.STATUS_CHANGED, user, description="savepoint kept")
+
+        self.assertCountEqual(
+            TimelineEntry.objects.filter(user=user).values_list("description", flat=True),
+            ["kept", "savepoint kept"],
+        )
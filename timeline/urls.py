@@ -0,0 +1,7 @@
+from django.urls import path
+
+from timeline.views import TimelinePageView
+
+urlpatterns = [
+    path("page/", TimelinePageView.as_view(), name="timeline_page"),
+]
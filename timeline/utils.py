@@ -1,26 +1,42 @@
+import base64
 from collections import defaultdict
 from datetime import timedelta, datetime
-from uuid import UUID
+from urllib.parse import urlencode
 
-from django.contrib.auth import get_user_model
-from django.contrib.contenttypes.models import ContentType
+from django.conf import settings
+from django.db.models import Q
+from django.urls import reverse
 from django.utils import timezone
 
+from timeline.facets import get_timeline_facets
 from timeline.models import TimelineEntry, TimelineTypes
+from timeline.scope import TimelineScope
+from timeline.writer import TimelineWriter, get_timeline_writer
 
 
-def add_entry(event_type, user, section=None, description="", related_object=None, created_by=None, timestamp=None):
-    entry = TimelineEntry(
-        event_type=event_type,
-        user=user,
-        section=section,
-        description=description,
-        created_by=created_by,
-        timestamp=timestamp or timezone.now()
-    )
-    if related_object:
-        entry.content_type = ContentType.objects.get_for_model(related_object)
-        entry.object_id = related_object.id
+def add_entry(event_type, user, section=None, description="", related_object=None, created_by=None, timestamp=None,
+              snapshot_name=None):
+    """
+    Record a timeline entry. Inside a transaction or a `with TimelineWriter()`
+    batch it is buffered and bulk-created on commit, otherwise written at once.
+    """
+    writer = get_timeline_writer()
+    if writer is None:
+        writer = TimelineWriter()
+        entry = writer.add(event_type, user, section, description, related_object, created_by, timestamp, snapshot_name)
+        writer.flush()
+        return entry
+    return writer.add(event_type, user, section, description, related_object, created_by, timestamp, snapshot_name)
+
+def add_slot_entry(event_type, slot_id, role_id=None, related_object=None, timestamp=None):
+    """Record a timeline entry for the user holding a section slot, resolved when the entry is written"""
+    writer = get_timeline_writer()
+    if writer is None:
+        writer = TimelineWriter()
+        entry = writer.add_for_slot(event_type, slot_id, role_id, related_object, timestamp)
+        writer.flush()
+        return entry
+    return writer.add_for_slot(event_type, slot_id, role_id, related_object, timestamp)
 
 def get_recent_orbat_timeline(user_qs=None, section=None):
     three_months_ago = timezone.now() - timedelta(days=90)
@@ -44,14 +60,9 @@ def get_recent_training_timeline(user_qs=None, section=None):
 def get_timeline_entries(user_qs=None, section=None, start_date=None, end_date=None, event_types=None, exclude_types=None):
     """
     Get timeline entries scoped to users and optionally a section and date range.
+    `user_qs` is anything TimelineScope.from_users accepts, None meaning every user.
     """
-    from django.contrib.auth import get_user_model
-    User = get_user_model()
-
-    if not user_qs or not user_qs.exists():
-        user_qs = User.objects.all()
-
-    qs = TimelineEntry.objects.filter(user__in=user_qs)
+    qs = TimelineScope.from_users(user_qs).apply(TimelineEntry.objects.all())
 
     if section:
         qs = qs.filter(section=section)
@@ -70,40 +81,118 @@ def build_timeline_context(timeline_qs):
     Build context for timeline filters: available users, sections, and date ranges.
     Returns a dict to merge into the template context.
     """
-    # Unique users and sections from the timeline queryset
-    timeline_qs = timeline_qs.select_related('user', 'section')
-    users = sorted({entry.user for entry in timeline_qs}, key=lambda u: getattr(u, 'display_name', str(u)))
-    sections = sorted({entry.section for entry in timeline_qs if entry.section}, key=lambda s: s.name)
+    facets = get_timeline_facets(timeline_qs)
 
     context = {}
 
-    if len(users) > 1:
-        context["timeline_scope_users"] = users
-    if len(sections) > 1:
-        context["timeline_scope_sections"] = sections
-
-    # Date range buttons
-    now = timezone.now().date()
-    context['timeline_scope_ranges'] = [
-        ('last_week', now - timedelta(days=7)),
-        ('last_month', now - timedelta(days=30)),
-        ('last_3_months', now - timedelta(days=90)),
-        ('last_6_months', now - timedelta(days=180)),
-        ('last_year', now - timedelta(days=365)),
-    ]
+    if len(facets["users"]) > 1:
+        context["timeline_scope_users"] = facets["users"]
+    if len(facets["sections"]) > 1:
+        context["timeline_scope_sections"] = facets["sections"]
+
+    # Date range buttons as (label, start date, entry count)
+    context['timeline_scope_ranges'] = facets["ranges"]
 
     return context
 
 def group_timeline_entries(entries_qs):
-    entries_qs = entries_qs.select_related('user', 'section').order_by('-timestamp')
+    entries_qs = entries_qs.select_related('user', 'section').order_by('-timestamp', '-id')
+    return group_entries_by_date(entries_qs)
 
+def group_entries_by_date(entries):
+    """Group entries already ordered newest first into [(date, [entry, ...]), ...]"""
     grouped = defaultdict(list)
-    for entry in entries_qs.order_by('-timestamp'):
+    for entry in entries:
         grouped[entry.timestamp.date()].append(entry)
 
     # sorted by date descending
     return sorted(grouped.items(), key=lambda x: x[0], reverse=True)
 
+# --- Keyset pagination ---
+
+def encode_timeline_cursor(entry):
+    raw = f"{entry.timestamp.isoformat()}|{entry.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_timeline_cursor(cursor):
+    """(timestamp, id) from a cursor, raises ValueError if it is malformed"""
+    try:
+        timestamp, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(entry_id)
+    except ValueError as e:
+        raise ValueError(f"Invalid timeline cursor: {cursor}") from e
+
+def get_timeline_page(entries_qs, cursor=None, page_size=None):
+    """
+    One page of timeline entries, newest first, continuing after `cursor`.
+    Keyset pagination over (timestamp, id) so each page is a bounded index range scan.
+    Returns {"entries": [(date, [entry, ...]), ...], "next_cursor", "continued_date"}.
+    """
+    page_size = page_size or getattr(settings, "TIMELINE_PAGE_SIZE", 50)
+    entries_qs = entries_qs.select_related('user', 'section').order_by('-timestamp', '-id')
+
+    continued_date = None
+    if cursor:
+        timestamp, entry_id = decode_timeline_cursor(cursor)
+        entries_qs = entries_qs.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=entry_id))
+        continued_date = timestamp.date()
+
+    entries = list(entries_qs[:page_size + 1])
+    has_more = len(entries) > page_size
+    entries = entries[:page_size]
+
+    return {
+        "entries": group_entries_by_date(entries),
+        "next_cursor": encode_timeline_cursor(entries[-1]) if has_more else None,
+        # The first date group on this page continues the last one on the previous page
+        "continued_date": continued_date,
+    }
+
+def get_timeline_page_url(cursor, user_qs=None, section=None, start_date=None, end_date=None, event_types=None, exclude_types=None):
+    """URL of the next timeline page partial, carrying the timeline scope as query params"""
+    params = [("cursor", cursor)]
+    params.extend(TimelineScope.from_users(user_qs).query_params())
+    if section:
+        params.append(("section", getattr(section, "pk", section)))
+    if start_date:
+        params.append(("start", start_date.isoformat()))
+    if end_date:
+        params.append(("end", end_date.isoformat()))
+    params.extend(("type", t) for t in event_types or [])
+    params.extend(("exclude", t) for t in exclude_types or [])
+
+    return f"{reverse('timeline_page')}?{urlencode(params)}"
+
+def build_timeline_page_context(entries_qs, cursor=None, **scope):
+    """
+    Context for one rendered timeline page. `scope` holds the get_timeline_entries
+    arguments used to build `entries_qs`, so the next page can rebuild it.
+    """
+    page = get_timeline_page(entries_qs, cursor)
+    return {
+        "entries": page["entries"],
+        "continued_date": page["continued_date"],
+        "history_resolver": get_history_resolver(page["entries"]),
+        "next_url": get_timeline_page_url(page["next_cursor"], **scope) if page["next_cursor"] else None,
+    }
+
+def parse_timeline_datetime(value):
+    """Aware datetime from an ISO date or datetime string, None if missing or malformed"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+def get_history_resolver(grouped_entries):
+    """HistoryResolver covering every entry of `group_timeline_entries` output"""
+    from orbat.models.history import HistoryResolver
+    return HistoryResolver(
+        (entry.user, entry.timestamp) for _, entries in grouped_entries for entry in entries
+    )
+
 def get_active_context(request):
     active_user = request.GET.get("timeline_user") if request else None
     active_section = request.GET.get("timeline_section") if request else None
@@ -116,35 +205,10 @@ def get_active_context(request):
     }
 
 def get_user_query(user_qs, active_timeline_user=None):
-    User = get_user_model()
-
-    # If an active user is set via the query param
+    """TimelineScope for the timeline users, the active user query param taking precedence"""
     if active_timeline_user:
-        return User.objects.filter(pk=active_timeline_user)
-
-    # If a single User instance
-    if isinstance(user_qs, User):
-        return User.objects.filter(pk=user_qs.pk)
-
-    # If a single UUID
-    if isinstance(user_qs, UUID) or isinstance(user_qs, str):
-        return User.objects.filter(pk=user_qs)
-
-    # If None, return all users
-    if user_qs is None:
-
-        return User.objects.all()
-
-    # If it's already a queryset or iterable of PKs
-    try:
-        # If it's a queryset, return as-is
-        if hasattr(user_qs, "exists"):
-            return user_qs
-        # If it's an iterable of UUIDs/PKs, wrap in queryset
-        return User.objects.filter(pk__in=list(user_qs))
-    except Exception:
-        # Fallback to all users
-        return User.objects.all()
+        return TimelineScope.for_user(active_timeline_user)
+    return TimelineScope.from_users(user_qs)
 
 
 def get_section_query(section_qs, active_timeline_section=None):
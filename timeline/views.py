@@ -1,3 +1,57 @@
+from uuid import UUID
+
+from django.http import HttpResponseBadRequest
 from django.shortcuts import render
+from django.views import View
+
+from timeline.scope import TimelineScope
+from timeline.utils import get_timeline_entries, build_timeline_page_context, parse_timeline_datetime, \
+    decode_timeline_cursor
+from users.models import UserStatus
+
+# Query params holding ids, checked before any of them reach a query
+INTEGER_PARAMS = ["section", "scope_section", "scope_user_section"]
+
+
+def get_invalid_param(params):
+    """Name of the first malformed timeline query param, None if they are all valid"""
+    for name in INTEGER_PARAMS:
+        value = params.get(name)
+        if value and not value.isdigit():
+            return name
+    for value in params.getlist("user"):
+        try:
+            UUID(value)
+        except ValueError:
+            return "user"
+    if any(value not in UserStatus.values for value in params.getlist("scope_user_status")):
+        return "scope_user_status"
+    if params.get("cursor"):
+        try:
+            decode_timeline_cursor(params["cursor"])
+        except ValueError:
+            return "cursor"
+    return None
+
+
+class TimelinePageView(View):
+    """Next page of a timeline, requested by the infinite scroll sentinel"""
+    template_name = "partials/timeline_page.html"
+
+    def get(self, request):
+        invalid_param = get_invalid_param(request.GET)
+        if invalid_param:
+            return HttpResponseBadRequest(f"Invalid timeline parameter: {invalid_param}")
+
+        scope = {
+            "user_qs": TimelineScope.from_params(request.GET),
+            "section": request.GET.get("section") or None,
+            "start_date": parse_timeline_datetime(request.GET.get("start")),
+            "end_date": parse_timeline_datetime(request.GET.get("end")),
+            "event_types": request.GET.getlist("type"),
+            "exclude_types": request.GET.getlist("exclude"),
+        }
+        entries = get_timeline_entries(**scope)
+        context = build_timeline_page_context(entries, request.GET.get("cursor"), **scope)
 
-# Create your views here.
+        return render(request, self.template_name, context)
@@ -0,0 +1,120 @@
+import threading
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from core.transactions import get_commit_buffer
+from timeline.facets import bump_timeline_version
+from timeline.models import TimelineEntry
+
+_state = threading.local()
+
+
+class TimelineWriter:
+    """
+    Buffers timeline entries and writes them with a single bulk_create.
+    Content types are resolved together at flush time through the
+    ContentType cache, and entries queued against a section slot get their
+    user, section and role name from one lookup per flush.
+    """
+
+    def __init__(self):
+        self.entries = []
+        # (entry, related model, related pk) waiting on a content type
+        self._related = []
+        # (entry, slot id, role id) waiting on the slot's user
+        self._slot_entries = []
+
+    def __len__(self):
+        return len(self.entries) + len(self._slot_entries)
+
+    def add(self, event_type, user, section=None, description="", related_object=None, created_by=None,
+            timestamp=None, snapshot_name=None):
+        """Queue an entry. `user`, `section` and `created_by` may be instances or pks."""
+        entry = TimelineEntry(
+            event_type=event_type,
+            user_id=getattr(user, "pk", user),
+            section_id=getattr(section, "pk", section),
+            description=description,
+            created_by_id=getattr(created_by, "pk", created_by),
+            snapshot_name=snapshot_name,
+            timestamp=timestamp or timezone.now(),
+        )
+        self._track_related(entry, related_object)
+        self.entries.append(entry)
+        return entry
+
+    def add_for_slot(self, event_type, slot_id, role_id=None, related_object=None, timestamp=None):
+        """Queue an entry for whoever holds `slot_id` when the writer flushes"""
+        entry = TimelineEntry(event_type=event_type, timestamp=timestamp or timezone.now())
+        self._track_related(entry, related_object)
+        self._slot_entries.append((entry, slot_id, role_id))
+        return entry
+
+    def _track_related(self, entry, related_object):
+        if related_object is not None:
+            self._related.append((entry, type(related_object), related_object.pk))
+
+    def _resolve_slot_entries(self):
+        from orbat.models import SectionSlot, Role
+
+        slot_ids = {slot_id for _, slot_id, _ in self._slot_entries}
+        role_ids = {role_id for _, _, role_id in self._slot_entries if role_id}
+        slots = {
+            pk: (user_id, section_id)
+            for pk, user_id, section_id in SectionSlot.objects.filter(pk__in=slot_ids)
+            .values_list("pk", "user_id", "section_id")
+        }
+        role_names = dict(Role.objects.filter(pk__in=role_ids).values_list("pk", "name")) if role_ids else {}
+
+        for entry, slot_id, role_id in self._slot_entries:
+            user_id, section_id = slots.get(slot_id, (None, None))
+            if not user_id:
+                continue  # Nobody holds the slot, nothing to record
+            entry.user_id, entry.section_id = user_id, section_id
+            entry.description = role_names.get(role_id, "")
+            self.entries.append(entry)
+
+    def flush(self):
+        """Write every queued entry, returns the created entries"""
+        if self._slot_entries:
+            self._resolve_slot_entries()
+
+        if self._related:
+            content_types = ContentType.objects.get_for_models(*{model for _, model, _ in self._related})
+            for entry, model, pk in self._related:
+                entry.content_type = content_types[model]
+                entry.object_id = pk
+
+        entries = self.entries
+        self.entries, self._related, self._slot_entries = [], [], []
+        if entries:
+            TimelineEntry.objects.bulk_create(entries)
+            # bulk_create skips the post_save receiver that invalidates facets
+            bump_timeline_version()
+        return entries
+
+    def __enter__(self):
+        _state.batches = getattr(_state, "batches", []) + [self]
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _state.batches = _state.batches[:-1]
+        if exc_type is None:
+            transaction.on_commit(self.flush)
+
+
+def get_timeline_writer():
+    """
+    Writer that new entries should go to: the innermost `with TimelineWriter()`
+    batch, else one flushed when the current transaction commits. Each
+    savepoint gets its own writer, so entries from a savepoint that rolls
+    back are dropped with it.
+    Outside a transaction there is nothing to wait for, so None is returned
+    and entries are written straight away.
+    """
+    batches = getattr(_state, "batches", None)
+    if batches:
+        return batches[-1]
+    return get_commit_buffer("timeline_writer", TimelineWriter)
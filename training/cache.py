@@ -0,0 +1,6 @@
+from core.cache import invalidate_on_commit
+
+
+def invalidate_training_cache():
+    """Mark cached training reports stale once the current transaction commits"""
+    invalidate_on_commit("training")
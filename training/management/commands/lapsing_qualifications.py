@@ -0,0 +1,58 @@
+import datetime
+from itertools import groupby
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from training.models import Qualification, UserQualification
+
+
+class Command(BaseCommand):
+    help = (
+        "List qualifications that expire within the next N days so recertification can be scheduled. "
+        "Run it periodically, e.g. from a daily cron job."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.TRAINING_EXPIRY_WARNING_DAYS,
+            help="How far ahead to look (default TRAINING_EXPIRY_WARNING_DAYS, currently %(default)s)",
+        )
+        parser.add_argument(
+            "--include-expired", action="store_true",
+            help="Also list passes that have already expired",
+        )
+        parser.add_argument(
+            "--backfill", action="store_true",
+            help="First compute expires_on for passes recorded before validity periods were tracked",
+        )
+
+    def handle(self, *args, **options):
+        if options["backfill"]:
+            self.backfill()
+
+        today = timezone.localdate()
+        start = datetime.date.min if options["include_expired"] else today
+        end = today + datetime.timedelta(days=options["days"])
+
+        lapsing = list(UserQualification.objects.lapsing(start, end))
+        if not lapsing:
+            self.stdout.write(f"Nothing expires before {end:%Y-%m-%d}.")
+            return
+
+        lapsing.sort(key=lambda uq: (uq.qualification.order, uq.qualification_id, uq.expires_on))
+        for qualification, rows in groupby(lapsing, key=lambda uq: uq.qualification):
+            self.stdout.write(self.style.MIGRATE_HEADING(qualification.name))
+            for uq in rows:
+                days_left = (uq.expires_on - today).days
+                when = f"expired {-days_left}d ago" if days_left < 0 else f"in {days_left}d"
+                self.stdout.write(f"  {uq.user.display_name}: {uq.expires_on:%Y-%m-%d} ({when})")
+
+        self.stdout.write(self.style.SUCCESS(f"{len(lapsing)} qualification(s) lapsing before {end:%Y-%m-%d}."))
+
+    def backfill(self):
+        updated = 0
+        for qualification in Qualification.objects.filter(validity_days__isnull=False):
+            updated += UserQualification.objects.refresh_expiry(qualification)
+        self.stdout.write(f"Updated the expiry date of {updated} pass(es).")
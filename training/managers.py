@@ -1,9 +1,8 @@
-
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef, Q, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
-from training.models import UserQualification, UserQualificationCriterion
-
 
 class QualificationManager(models.Manager):
 
@@ -15,26 +14,12 @@ class QualificationManager(models.Manager):
         """Prefetch criteria for all qualifications."""
         return self.prefetch_related("criteria")
 
-    def award_to_user(self, user, qualification, event=None, awarded_by=None):
+    def award_to_user(self, user, qualification, awarded_by=None, date=None):
         """
         Award a qualification to a user and automatically mark all criteria completed.
         """
-        uq, created = UserQualification.objects.get_or_create(
-            user=user,
-            qualification=qualification,
-            defaults={
-                "event": event,
-                "date_awarded": timezone.now().date(),
-                "awarded_by": awarded_by,
-            }
-        )
-
-        # Create UserQualificationCriterion entries if not already present
-        existing_criteria_ids = set(uq.criteria_status.values_list('criterion_id', flat=True))
-        for criterion in qualification.criteria.exclude(id__in=existing_criteria_ids):
-            UserQualificationCriterion.objects.create(user_qualification=uq, criterion=criterion)
-
-        return uq
+        from training.models import UserQualification
+        return UserQualification.objects.award_bulk([user], qualification, awarded_by=awarded_by, date=date)[0]
 
 
 class UserQualificationManager(models.Manager):
@@ -45,20 +30,107 @@ class UserQualificationManager(models.Manager):
 
     def missing_criteria(self, user):
         """Return a list of criteria not yet awarded for this user's qualifications."""
-        missing = []
-        for uq in self.filter(user=user):
-            completed_ids = set(uq.criteria_status.values_list("criterion_id", flat=True))
-            all_ids = set(uq.qualification.criteria.values_list("id", flat=True))
-            missing.extend(uq.qualification.criteria.filter(id__in=all_ids - completed_ids))
-        return missing
-
-    def award_bulk(self, users, qualification, event=None, awarded_by=None):
-        """Award the same qualification to multiple users at once."""
-        results = []
-        for user in users:
-            uq = self.model.objects.award_to_user(user, qualification, event=event, awarded_by=awarded_by)
-            results.append(uq)
-        return results
+        from training.models import QualificationCriterion, UserQualificationCriterion
+        completed = UserQualificationCriterion.objects.filter(
+            user_qualification__user=user, criterion=OuterRef("pk"),
+        )
+        return list(
+            QualificationCriterion.objects
+            .filter(qualification__userqualification__user=user)
+            .filter(~Exists(completed))
+            .select_related("qualification")
+        )
+
+    def lapsing(self, start, end):
+        """Passes expiring between `start` and `end` inclusive, one range scan on expires_on"""
+        return (
+            self.filter(expires_on__range=(start, end), qualification__is_active=True)
+            .select_related("user", "qualification")
+            .order_by("expires_on", "qualification__order")
+        )
+
+    def refresh_expiry(self, qualification):
+        """Recompute expires_on for every pass of `qualification` after its validity changed"""
+        rows = list(self.filter(qualification=qualification).only("id", "latest_passed", "expires_on"))
+        changed = []
+        for uq in rows:
+            expires_on = qualification.get_expiry_date(uq.latest_passed)
+            if uq.expires_on != expires_on:
+                uq.expires_on = expires_on
+                changed.append(uq)
+        self.bulk_update(changed, ["expires_on"], batch_size=1000)
+        return len(changed)
+
+    def award_bulk(self, users, qualification, awarded_by=None, date=None):
+        """
+        Award the same qualification to multiple users at once, in a fixed
+        number of queries whatever the number of users or criteria.
+        Missing UserQualification and criterion rows are inserted, latest_passed
+        is moved forward in one update and a TRAINING_COMPLETED timeline entry is
+        written for every user whose pass is new or more recent.
+        Returns the users' UserQualification rows.
+        """
+        from training.cache import invalidate_training_cache
+        from training.models import UserQualificationCriterion
+        from timeline.models import TimelineTypes
+        from timeline.writer import TimelineWriter
+
+        date = date or timezone.now().date()
+        user_ids = list({getattr(user, "pk", user) for user in users})
+        scope = self.filter(user_id__in=user_ids, qualification=qualification)
+
+        with transaction.atomic():
+            previous = dict(scope.values_list("user_id", "latest_passed"))
+            self.bulk_create(
+                [
+                    self.model(
+                        user_id=user_id,
+                        qualification=qualification,
+                        date_awarded=date,
+                        latest_passed=date,
+                        expires_on=qualification.get_expiry_date(date),
+                        awarded_by=awarded_by,
+                    )
+                    for user_id in user_ids if user_id not in previous
+                ],
+                ignore_conflicts=True,
+            )
+            renewed = {
+                "date_awarded": Coalesce("date_awarded", Value(date)),
+                "latest_passed": date,
+                "expires_on": qualification.get_expiry_date(date),
+            }
+            if awarded_by is not None:
+                renewed["awarded_by"] = awarded_by
+            scope.filter(Q(latest_passed__isnull=True) | Q(latest_passed__lt=date)).update(**renewed)
+
+            user_quals = list(scope)
+            criterion_ids = list(qualification.criteria.values_list("id", flat=True))
+            UserQualificationCriterion.objects.bulk_create(
+                [
+                    UserQualificationCriterion(user_qualification=uq, criterion_id=criterion_id)
+                    for uq in user_quals
+                    for criterion_id in criterion_ids
+                ],
+                ignore_conflicts=True,
+            )
+
+            # Bulk writes skip the training signals
+            invalidate_training_cache()
+
+            with TimelineWriter() as writer:
+                for uq in user_quals:
+                    latest = previous.get(uq.user_id)
+                    if latest is None or latest < date:
+                        writer.add(
+                            TimelineTypes.TRAINING_COMPLETED,
+                            uq.user_id,
+                            description=qualification.name,
+                            related_object=uq,
+                            created_by=awarded_by,
+                        )
+
+        return user_quals
 
 
 class QualificationEventManager(models.Manager):
@@ -68,8 +140,16 @@ class QualificationEventManager(models.Manager):
         return self.filter(qualification=qualification)
 
     def get_users_awarded(self, qualification):
-        """Return all users who earned this qualification via events."""
+        """
+        Return the qualification's UserQualification rows held by users who
+        attended one of its events. Awards don't record an event, so this is
+        inferred from attendance.
+        """
+        from attendance.models import Attendance
+        from training.models import UserQualification
         return UserQualification.objects.filter(
             qualification=qualification,
-            event__in=self.filter(qualification=qualification)
+            user__in=Attendance.objects.filter(
+                event__qualification_events__qualification=qualification
+            ).values("user_id"),
         )
@@ -0,0 +1,61 @@
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from training.models import Qualification, UserQualification
+
+
+def encode_bitset(indexes, width):
+    """
+    Hex string of a bitset, least significant nibble first: character k holds
+    bits 4k..4k+3, so bit i is (parseInt(bits[i >> 2], 16) >> (i & 3)) & 1.
+    """
+    mask = 0
+    for index in indexes:
+        mask |= 1 << index
+    return "".join(format((mask >> shift) & 0xF, "x") for shift in range(0, max(width, 1), 4))
+
+
+def build_training_matrix(users_qs, today=None):
+    """
+    Columnar training matrix for the users in `users_qs`, in three queries.
+    Each user's qualifications are bitsets indexed by the position of the
+    qualification in `qualifications` (active ones, by order): `bits` holds
+    current passes, `expiring` the current ones expiring within
+    TRAINING_EXPIRY_WARNING_DAYS and `expired` the lapsed ones.
+    """
+    today = today or timezone.localdate()
+    warn_until = today + datetime.timedelta(days=getattr(settings, "TRAINING_EXPIRY_WARNING_DAYS", 30))
+
+    qualifications = list(Qualification.objects.filter(is_active=True).order_by("order").values("id", "name"))
+    column = {q["id"]: index for index, q in enumerate(qualifications)}
+
+    users = list(users_qs.order_by("username").values_list("id", "username"))
+
+    passed, expiring, expired = {}, {}, {}
+    for user_id, qualification_id, expires_on in (
+        UserQualification.objects
+        .filter(user__in=users_qs, latest_passed__isnull=False, qualification__is_active=True)
+        .values_list("user_id", "qualification_id", "expires_on")
+    ):
+        if expires_on is not None and expires_on < today:
+            expired.setdefault(user_id, []).append(column[qualification_id])
+            continue
+        passed.setdefault(user_id, []).append(column[qualification_id])
+        if expires_on is not None and expires_on <= warn_until:
+            expiring.setdefault(user_id, []).append(column[qualification_id])
+
+    def bitsets(by_user):
+        return [encode_bitset(by_user.get(user_id, []), len(qualifications)) for user_id, _ in users]
+
+    return {
+        "qualifications": qualifications,
+        "users": {
+            "ids": [str(user_id) for user_id, _ in users],
+            "usernames": [username for _, username in users],
+            "bits": bitsets(passed),
+            "expiring": bitsets(expiring),
+            "expired": bitsets(expired),
+        },
+    }
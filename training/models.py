@@ -1,18 +1,41 @@
+import datetime
+
 from django.conf import settings
 from django.db import models
 
+from core.mixins.model_mixin import LoadedValuesMixin
 from events.models import Event
+from training.managers import QualificationManager, UserQualificationManager, QualificationEventManager
 
 
-class Qualification(models.Model):
+class Qualification(LoadedValuesMixin, models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
     order = models.PositiveIntegerField(default=0)
+    validity_days = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Days a pass stays current before recertification is needed. Empty never expires."
+    )
+
+    objects = QualificationManager()
+
+    _tracked_fields = ["validity_days"]
 
     def __str__(self):
         return self.name
 
+    def get_expiry_date(self, passed_on):
+        if passed_on is None or self.validity_days is None:
+            return None
+        return passed_on + datetime.timedelta(days=self.validity_days)
+
+    def save(self, *args, **kwargs):
+        validity_changed = not self._state.adding and self.get_loaded_value("validity_days") != self.validity_days
+        super().save(*args, **kwargs)
+        if validity_changed:
+            UserQualification.objects.refresh_expiry(self)
+
 class QualificationCriterion(models.Model):
     qualification = models.ForeignKey(
         "Qualification",
@@ -35,6 +58,8 @@ class QualificationEvent(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="qualification_events")
     qualification = models.ForeignKey("training.Qualification", on_delete=models.CASCADE, related_name="qualification_events")
 
+    objects = QualificationEventManager()
+
     class Meta:
         unique_together = ("event", "qualification")
 
@@ -50,6 +75,10 @@ class UserQualification(models.Model):
     date_awarded = models.DateField(null=True, blank=True)
     latest_passed = models.DateField(null=True, blank=True)
     awarded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="qualifications_awarded")
+    # latest_passed + qualification.validity_days, kept in sync on save and award
+    expires_on = models.DateField(null=True, blank=True, db_index=True)
+
+    objects = UserQualificationManager()
 
     class Meta:
         unique_together = ("user", "qualification")
@@ -57,6 +86,12 @@ class UserQualification(models.Model):
     def __str__(self):
         return f"{self.user.display_name} - {self.qualification.name}"
 
+    def save(self, *args, **kwargs):
+        self.expires_on = self.qualification.get_expiry_date(self.latest_passed)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "expires_on"}
+        super().save(*args, **kwargs)
+
 class UserQualificationCriterion(models.Model):
     """
     Tracks which criteria a user has completed for a qualification.
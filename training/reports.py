@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, F, OuterRef
+
+from core.cache import get_version, queryset_key
+from training.models import UserQualification, UserQualificationCriterion
+
+
+def outstanding_criteria(users_qs=None, qualifications=None):
+    """
+    One row per (user qualification, criterion) the user has not completed,
+    as a single query joining each user qualification to its qualification's
+    criteria and anti-joining the completed UserQualificationCriterion rows.
+    """
+    qs = UserQualification.objects.all()
+    if users_qs is not None:
+        qs = qs.filter(user__in=users_qs)
+    if qualifications is not None:
+        qs = qs.filter(qualification__in=qualifications)
+
+    completed = UserQualificationCriterion.objects.filter(
+        user_qualification=OuterRef("pk"), criterion=OuterRef("criterion_id"),
+    )
+    return (
+        qs.filter(qualification__criteria__isnull=False)
+        .annotate(criterion_id=F("qualification__criteria__id"))
+        .filter(~Exists(completed))
+        .order_by("user__display_name", "qualification__order", "qualification__criteria__order")
+        .values(
+            "user_id", "user__display_name",
+            "qualification_id", "qualification__name",
+            "criterion_id", "qualification__criteria__name",
+        )
+    )
+
+
+def build_training_gaps(users_qs=None, qualifications=None):
+    """
+    Outstanding criteria grouped per user, then per qualification:
+    [{"user_id", "display_name", "qualifications": [{"id", "name", "criteria": [{"id", "name"}]}]}]
+    """
+    gaps = []
+    for row in outstanding_criteria(users_qs, qualifications):
+        if not gaps or gaps[-1]["user_id"] != str(row["user_id"]):
+            gaps.append({"user_id": str(row["user_id"]), "display_name": row["user__display_name"], "qualifications": []})
+        user_quals = gaps[-1]["qualifications"]
+        if not user_quals or user_quals[-1]["id"] != row["qualification_id"]:
+            user_quals.append({"id": row["qualification_id"], "name": row["qualification__name"], "criteria": []})
+        user_quals[-1]["criteria"].append({"id": row["criterion_id"], "name": row["qualification__criteria__name"]})
+    return gaps
+
+
+def get_training_gaps(users_qs=None, qualifications=None):
+    """build_training_gaps cached per scope until the next award or criterion change"""
+    scope = queryset_key(outstanding_criteria(users_qs, qualifications))
+    if scope is None:
+        return []
+
+    key = f"training:{get_version('training')}:gaps:{scope}"
+    gaps = cache.get(key)
+    if gaps is None:
+        gaps = build_training_gaps(users_qs, qualifications)
+        cache.set(key, gaps, getattr(settings, "TRAINING_REPORT_TIMEOUT", 3600))
+    return gaps
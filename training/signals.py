@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from training.cache import invalidate_training_cache
+from training.models import UserQualification, UserQualificationCriterion, QualificationCriterion
+
+
+@receiver([post_save, post_delete], sender=UserQualification)
+@receiver([post_save, post_delete], sender=UserQualificationCriterion)
+@receiver([post_save, post_delete], sender=QualificationCriterion)
+def invalidate_on_training_change(sender, instance, **kwargs):
+    invalidate_training_cache()
@@ -1,3 +1,117 @@
+from datetime import date, time
+
+from django.contrib.contenttypes.models import ContentType
 from django.test import TestCase
+from django.urls import reverse
+
+from events.models import Event
+from training.models import Qualification, QualificationCriterion, QualificationEvent, UserQualification, \
+    UserQualificationCriterion
+from training.reports import build_training_gaps, outstanding_criteria
+from timeline.models import TimelineEntry, TimelineTypes
+from users.models import CustomUser
+
+
+class UserTrainingViewQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = CustomUser.objects.create(username="viewer", display_name="viewer", is_staff=True)
+        cls.user = CustomUser.objects.create(username="trainee", display_name="trainee")
+
+    def add_qualifications(self, count, criteria=3, events=2):
+        """Qualifications with criteria and events, awarded to the user"""
+        offset = Qualification.objects.count()
+        for i in range(offset, offset + count):
+            qualification = Qualification.objects.create(name=f"Qualification {i}", order=i, validity_days=365)
+            for order in range(criteria):
+                QualificationCriterion.objects.create(qualification=qualification, name=f"Criterion {order}", order=order)
+            for n in range(events):
+                event = Event.objects.create(
+                    name=f"Course {i}.{n}", date=date(2026, 1, 1 + n), start_time=time(19), end_time=time(21), type="TR"
+                )
+                QualificationEvent.objects.create(event=event, qualification=qualification)
+            UserQualification.objects.award_bulk([self.user], qualification, date=date(2026, 1, 1))
+
+    def get_page(self):
+        return self.client.get(reverse("user_profile_training", args=[self.user.pk]))
+
+    def test_query_count_is_constant_as_qualifications_grow(self):
+        self.client.force_login(self.viewer)
+        self.add_qualifications(1)
+        # Session, viewer, profile user, awards, completed criteria, qualifications,
+        # their criteria and the nav shortcuts
+        with self.assertNumQueries(8):
+            response = self.get_page()
+        self.assertEqual(len(response.context["training_data"]), 1)
+
+        self.add_qualifications(12, criteria=6, events=4)
+        with self.assertNumQueries(8):
+            response = self.get_page()
+        self.assertEqual(len(response.context["training_data"]), 13)
+        self.assertTrue(all(q["passed"] and all(c["completed"] for c in q["criteria"])
+                            for q in response.context["training_data"]))
+
+
+class AwardBulkTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [CustomUser.objects.create(username=f"trainee{i}", display_name=f"trainee{i}") for i in range(30)]
+        cls.qualification = Qualification.objects.create(name="Medic", order=1, validity_days=365)
+        for order in range(4):
+            QualificationCriterion.objects.create(qualification=cls.qualification, name=f"Criterion {order}", order=order)
+
+    def setUp(self):
+        # Timeline entries resolve their content type on flush, start from a cold cache
+        ContentType.objects.clear_cache()
+
+    def award(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return UserQualification.objects.award_bulk(self.users, self.qualification, date=date(2026, 1, 1))
+
+    def test_query_count_is_fixed(self):
+        # Savepoint, previous passes, awards insert, renewal update, awards, criteria ids,
+        # criteria insert, release, then the content type and the timeline insert on commit
+        with self.assertNumQueries(10):
+            self.award()
+        # Same statements minus the empty awards insert and the timeline flush
+        with self.assertNumQueries(7):
+            self.award()
+
+    def test_re_award_writes_nothing_twice(self):
+        self.award()
+        self.award()
+
+        self.assertEqual(UserQualification.objects.count(), 30)
+        self.assertEqual(UserQualificationCriterion.objects.count(), 30 * 4)
+        self.assertEqual(TimelineEntry.objects.filter(event_type=TimelineTypes.TRAINING_COMPLETED).count(), 30)
+
+
+class OutstandingCriteriaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username="trainee", display_name="trainee")
+        cls.other = CustomUser.objects.create(username="other", display_name="other")
+        cls.qualification = Qualification.objects.create(name="Medic", order=1)
+        cls.criteria = [
+            QualificationCriterion.objects.create(qualification=cls.qualification, name=f"Criterion {i}", order=i)
+            for i in range(4)
+        ]
+        user_qualification = UserQualification.objects.create(user=cls.user, qualification=cls.qualification)
+        for criterion in cls.criteria[::2]:
+            UserQualificationCriterion.objects.create(user_qualification=user_qualification, criterion=criterion)
+
+    def test_one_row_per_unmet_user_criterion(self):
+        rows = list(outstanding_criteria())
+        self.assertEqual(
+            [(row["user_id"], row["criterion_id"]) for row in rows],
+            [(self.user.pk, criterion.pk) for criterion in self.criteria[1::2]],
+        )
 
-# Create your tests here.
+    def test_gaps_group_unmet_criteria_under_the_qualification(self):
+        (gap,) = build_training_gaps(CustomUser.objects.filter(pk=self.user.pk))
+        (qualification,) = gap["qualifications"]
+        self.assertEqual(qualification["id"], self.qualification.pk)
+        self.assertEqual([c["name"] for c in qualification["criteria"]], ["Criterion 1", "Criterion 3"])
@@ -1,8 +1,9 @@
 from django.urls import path
 
-from training.views import TrainingHomeView, TrainingMatrixView
+from training.views import TrainingHomeView, TrainingMatrixView, TrainingGapsView
 
 urlpatterns = [
     path("", TrainingHomeView.as_view(), name="training_home"),
     path("matrix/", TrainingMatrixView.as_view(), name="training_matrix"),
+    path("gaps/", TrainingGapsView.as_view(), name="training_gaps"),
 ]
\ No newline at end of file
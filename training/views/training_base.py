@@ -2,6 +2,8 @@ from django.conf import settings
 
 from core.exceptions import WIPFeatureError
 from core.views import UnitHubBaseView
+from orbat.models import SectionAssignment
+from users.backends import User
 
 
 class TrainingBaseView(UnitHubBaseView):
@@ -22,10 +24,32 @@ class TrainingBaseView(UnitHubBaseView):
         context["sidebar"] = [
             {"name": "Overview", "path": "/training/"},
             {"name": "Matrix", "path": "/training/matrix/"},
+            {"name": "Training Gaps", "path": "/training/gaps/"},
             {"name": "Events", "path": "/events/training/"},
         ]
 
         if context["show_management"]:
             context["sidebar"].append({"name": "Management", "path": "/training/management/"})
 
-        return context
\ No newline at end of file
+        return context
+
+    def get_scoped_users(self, context):
+        """Users selected by the ?section= filter, also sets current_section_id"""
+        section_filter = self.request.GET.get("section")
+
+        if not section_filter:
+            context["current_section_id"] = None
+            return User.objects.filter(is_active=True)
+
+        if section_filter == "unassigned":
+            active_assignments = SectionAssignment.objects.filter(end_date__isnull=True)
+            assigned_user_ids = active_assignments.values_list('user_id', flat=True)
+            context["current_section_id"] = 'unassigned'
+            return User.objects.filter(is_active=True).exclude(id__in=assigned_user_ids)
+
+        context["current_section_id"] = int(section_filter)
+        return User.objects.filter(
+            id__in=SectionAssignment.objects.filter(
+                section_id=section_filter, end_date__isnull=True
+            ).values_list("user_id", flat=True)
+        )
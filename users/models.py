@@ -6,6 +6,7 @@ from django.db import models
 from django.db.models import Q
 from django.utils import timezone
 
+from core.mixins.model_mixin import LoadedValuesMixin
 from orbat.models import SectionAssignment, RoleSlotAssignment, SectionSlot, Section
 
 
@@ -37,7 +38,7 @@ class UserStatus(models.TextChoices):
     RESERVES = 'reserves', 'Reserves'
     RETIRED = 'retired', 'Retired'
 
-class CustomUser(AbstractBaseUser, PermissionsMixin):
+class CustomUser(LoadedValuesMixin, AbstractBaseUser, PermissionsMixin):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     email = models.EmailField(max_length=255, unique=True, null=True, blank=True)
     username = models.CharField(max_length=255, unique=True)
@@ -67,6 +68,8 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     objects = CustomUserManager()
 
+    _tracked_fields = ["status"]
+
     USERNAME_FIELD = 'id'
     REQUIRED_FIELDS = ['display_name', 'username']
 
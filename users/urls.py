@@ -1,6 +1,7 @@
 from django.contrib.auth.views import LogoutView
 from django.urls import path, include
 
+from attendance.views import UserAttendanceView
 from training.views import UserTrainingView
 from .views import *
 
@@ -15,4 +16,5 @@ urlpatterns = [
     path("profile/<uuid:user_id>/edit/", UserProfileEditView.as_view(), name="user_profile_edit"),
     path("profile/<uuid:user_id>/timeline/", ORBATTimelineView.as_view(), name="user_timeline"),
     path("profile/<uuid:user_id>/training/", UserTrainingView.as_view(), name="user_profile_training"),
+    path("profile/<uuid:user_id>/attendance/", UserAttendanceView.as_view(), name="user_profile_attendance"),
 ]
\ No newline at end of file